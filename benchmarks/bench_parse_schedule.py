@@ -0,0 +1,129 @@
+"""
+Сравнение скорости разбора листа: построчный алгоритм (как до векторизации)
+против parse_schedule_frame на масках NumPy.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_parse_schedule --employees 500 --days 31
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from excel_parser.parser import parse_schedule_frame
+
+from .workload import make_workbook
+
+def make_raw_frame(employees: int, days: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Строит "сырой" лист так же, как его читает parse_schedule (pd.read_excel(header=None)),
+    из синтетического файла benchmarks.workload.make_workbook.
+    """
+    with tempfile.TemporaryDirectory(prefix="duty-bench-") as directory:
+        path = make_workbook(os.path.join(directory, "01 график 2025.xlsx"), 2025, 1, employees, days, seed=seed)
+        return pd.read_excel(path, header=None)
+
+
+def legacy_parse_schedule_frame(raw_df: pd.DataFrame):
+    """
+    Прежний построчный алгоритм parse_schedule (iterrows/iat/iloc), без печати сообщений.
+    """
+    target_row, target_col = None, None
+    for i, row in raw_df.iterrows():
+        for j, val in enumerate(row):
+            if val == 1 or str(val).strip() == "1":
+                target_row, target_col = i, j
+                break
+        if target_row is not None:
+            break
+    if target_row is None or target_row - 1 < 0:
+        return None, None
+
+    employees = []
+    row_above = raw_df.iloc[target_row - 1]
+    col_index = target_col + 2
+    while col_index < len(row_above):
+        val = row_above[col_index]
+        if val is None or str(val).strip() == "":
+            break
+        employees.append(str(val).strip())
+        col_index += 1
+    if not employees:
+        return None, None
+
+    schedules = []
+    current_row = target_row
+    while current_row < len(raw_df):
+        val_date = raw_df.iat[current_row, target_col]
+        if isinstance(val_date, (int, float)) and not math.isnan(val_date):
+            row_values_list = raw_df.iloc[current_row, target_col + 2:col_index].tolist()
+            day_shifts = {}
+            for idx_emp, emp_name in enumerate(employees):
+                day_shifts[emp_name] = row_values_list[idx_emp]
+            schedules.append({"day": int(val_date), "shifts": day_shifts})
+            current_row += 1
+        else:
+            break
+    return employees, schedules
+
+
+def _same_value(a, b) -> bool:
+    if isinstance(a, np.generic):
+        a = a.item()
+    if isinstance(b, np.generic):
+        b = b.item()
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def same_result(expected, actual) -> bool:
+    """
+    Сравнивает результаты двух парсеров: списки сотрудников, дни и значения смен (NaN == NaN).
+    """
+    (emp_a, sched_a), (emp_b, sched_b) = expected, actual
+    if emp_a != emp_b or len(sched_a) != len(sched_b):
+        return False
+    for rec_a, rec_b in zip(sched_a, sched_b):
+        if rec_a["day"] != rec_b["day"] or list(rec_a["shifts"]) != list(rec_b["shifts"]):
+            return False
+        for name, value in rec_a["shifts"].items():
+            if not _same_value(value, rec_b["shifts"][name]):
+                return False
+    return True
+
+
+def best_of(func, raw_df, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(raw_df)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--employees", type=int, default=500)
+    arg_parser.add_argument("--days", type=int, default=31)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    raw_df = make_raw_frame(args.employees, args.days)
+    if not same_result(legacy_parse_schedule_frame(raw_df), parse_schedule_frame(raw_df)):
+        raise SystemExit("Результаты построчного и векторного разбора различаются!")
+
+    legacy = best_of(legacy_parse_schedule_frame, raw_df, args.repeat)
+    vectorized = best_of(parse_schedule_frame, raw_df, args.repeat)
+    print(f"Лист {args.employees} сотрудников × {args.days} дней")
+    print(f"  построчно:  {legacy * 1000:8.2f} мс")
+    print(f"  NumPy:      {vectorized * 1000:8.2f} мс")
+    print(f"  ускорение:  {legacy / vectorized:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Заглушка бота для замеров обработчиков без обращений к Telegram.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+
+class StubBot:
+    """
+    Минимальная замена telebot.TeleBot для register_handlers.
+
+    Декораторы message_handler/callback_query_handler сохраняют обработчики,
+    а методы API (send_message, answer_callback_query, ...) только записывают
+    вызовы в self.calls как (время, метод, args, kwargs).
+    """
+
+    API_METHODS = ("send_message", "answer_callback_query", "edit_message_reply_markup", "delete_message")
+
+    def __init__(self):
+        self.message_handlers = []
+        self.callback_query_handlers = []
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def message_handler(self, commands=None, func=None, **kwargs):
+        def decorator(handler):
+            self.message_handlers.append({"commands": commands, "func": func, "function": handler})
+            return handler
+        return decorator
+
+    def callback_query_handler(self, func=None, **kwargs):
+        def decorator(handler):
+            self.callback_query_handlers.append({"func": func, "function": handler})
+            return handler
+        return decorator
+
+    def __getattr__(self, name):
+        if name not in self.API_METHODS:
+            raise AttributeError(name)
+
+        def api_call(*args, **kwargs):
+            with self._lock:
+                self.calls.append((time.perf_counter(), name, args, kwargs))
+        return api_call
+
+    def command_handler(self, command: str):
+        for handler in self.message_handlers:
+            if handler["commands"] and command in handler["commands"]:
+                return handler["function"]
+        raise KeyError(command)
+
+    def callback_handler(self, data: str):
+        for handler in self.callback_query_handlers:
+            if handler["func"] is None or handler["func"](SimpleNamespace(data=data)):
+                return handler["function"]
+        raise KeyError(data)
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+
+
+def make_message(text: str, chat_id: int = 1, user_id: int = 1, message_id: int = 1):
+    return SimpleNamespace(
+        text=text,
+        chat=SimpleNamespace(id=chat_id),
+        from_user=SimpleNamespace(id=user_id),
+        message_id=message_id,
+    )
+
+
+def make_callback(data: str, chat_id: int = 1, user_id: int = 1, message_id: int = 1):
+    return SimpleNamespace(
+        id=str(message_id),
+        data=data,
+        from_user=SimpleNamespace(id=user_id),
+        message=make_message("", chat_id, user_id, message_id),
+    )
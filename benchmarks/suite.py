@@ -0,0 +1,434 @@
+"""
+Набор замеров: парсер, менеджер расписаний, импорт в базу и обработчики бота.
+
+Все сценарии работают на синтетических файлах (benchmarks.workload) во временном
+каталоге; туда же пишется база SQLite. Результат — JSON.
+
+Запуск из корня проекта:
+    python -m benchmarks.suite --employees 200 --months 6 --output results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+from .stub_bot import StubBot, make_callback, make_message
+from .workload import make_schedule_directory
+
+SCENARIOS = ("parse_schedule", "parse_schedule_from_directory", "manager", "roster", "import_excel_to_db",
+             "journal", "handlers", "notify")
+
+
+def summarize(samples):
+    """
+    Сводка по замерам (секунды) в миллисекундах.
+    """
+    ordered = sorted(samples)
+    to_ms = 1000.0
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * to_ms,
+        "median_ms": statistics.median(ordered) * to_ms,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * to_ms,
+        "max_ms": ordered[-1] * to_ms,
+        "mean_ms": statistics.fmean(ordered) * to_ms,
+    }
+
+
+def timed(func, repeat: int, *args, **kwargs):
+    """
+    Вызывает func repeat раз и возвращает (сводка, результат последнего вызова).
+    Печать внутри func (парсер и импорт пишут в stdout) подавляется.
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples), result
+
+
+def bench_parse_schedule(context, args):
+    from excel_parser.parser import parse_schedule
+
+    _, _, path = context["files"][-1]
+    stats, (employees, schedules) = timed(parse_schedule, args.repeat, path)
+    stats["rows"] = len(schedules or ())
+    stats["employees"] = len(employees or ())
+    return stats
+
+
+def bench_parse_schedule_from_directory(context, args):
+    from excel_parser.parser import parse_schedule_from_directory
+
+    stats, (employees, _) = timed(parse_schedule_from_directory, args.repeat, context["directory"])
+    stats["found"] = employees is not None
+    return stats
+
+
+def bench_manager(context, args):
+    from excel_parser.cache import ScheduleCache
+    from excel_parser.store import ScheduleStore
+    from schedule import ScheduleManager
+
+    year, month, _ = context["files"][-1]
+    manager = ScheduleManager(context["directory"], ScheduleStore(context["directory"], cache=ScheduleCache()))
+    first_load, month_schedule = timed(manager.get_month, 1, year, month)
+    days = [record["day"] for record in month_schedule.schedules]
+    employees = month_schedule.employees
+    rnd = random.Random(0)
+
+    day_samples = []
+    for _ in range(args.iterations):
+        day = rnd.choice(days)
+        started = time.perf_counter()
+        manager.get_day_schedule(day, year, month)
+        day_samples.append(time.perf_counter() - started)
+
+    swap_samples = []
+    for _ in range(args.iterations):
+        day1, day2 = rnd.choice(days), rnd.choice(days)
+        user1, user2 = rnd.choice(employees), rnd.choice(employees)
+        started = time.perf_counter()
+        manager.swap_shifts(day1, day2, user1, user2, year, month)
+        swap_samples.append(time.perf_counter() - started)
+
+    # Обмен с проверкой графика дежурств: первая проверка снимка строит RosterState,
+    # дальше состояние переносится между снимками (см. ScheduleManager._violations)
+    validated_samples = []
+    for _ in range(args.iterations):
+        day1, day2 = rnd.choice(days), rnd.choice(days)
+        user1, user2 = rnd.choice(employees), rnd.choice(employees)
+        started = time.perf_counter()
+        manager.swap_shifts(day1, day2, user1, user2, year, month, validate=True)
+        validated_samples.append(time.perf_counter() - started)
+
+    return {
+        "first_load": first_load,
+        "get_day_schedule": summarize(day_samples),
+        "swap_shifts": summarize(swap_samples),
+        "swap_shifts_validated": summarize(validated_samples),
+    }
+
+
+def bench_roster(context, args):
+    from schedule.roster import RosterState, generate_roster
+
+    year, month, _ = context["files"][-1]
+    matrix = context["manager"].get_month(year, month).matrix
+    stats, result = timed(generate_roster, args.repeat, matrix, duty_per_day=2, seed=args.seed)
+    stats["assigned"] = len(result["assigned"])
+    stats["unfilled"] = sum(result["unfilled"].values())
+
+    state = RosterState(matrix, duty_per_day=2)
+    days = state.days
+    employees = matrix.employees
+    rnd = random.Random(0)
+    check_samples = []
+    for _ in range(args.iterations):
+        day1, day2 = rnd.choice(days), rnd.choice(days)
+        user1, user2 = rnd.choice(employees), rnd.choice(employees)
+        changes = [(day1, user1, state.shift(day2, user2)), (day2, user2, state.shift(day1, user1))]
+        started = time.perf_counter()
+        state.check(changes)
+        check_samples.append(time.perf_counter() - started)
+
+    return {"generate_roster": stats, "check_swap": summarize(check_samples)}
+
+
+def bench_import_excel_to_db(context, args):
+    # База создаётся в текущем (временном) каталоге: db.engine указывает на schedule.db
+    from db import Schedule, Session
+    from scripts.importer import import_excel_to_db
+
+    _, _, path = context["files"][-1]
+    first, _ = timed(import_excel_to_db, 1, path)
+    reimport, _ = timed(import_excel_to_db, args.repeat, path)
+    with Session() as session:
+        rows = session.query(Schedule).count()
+    return {"first_import": first, "reimport": reimport, "rows": rows}
+
+
+def bench_journal(context, args):
+    """
+    Замены через журнал смен с фоновой записью в базу и сводкой shift_counts команды:
+    задержка изменения, время сброса пакетов и проверка, что сводка в базе совпадает
+    и со снимком месяца в памяти, и с полным пересчётом по schedules (refresh_shift_counts).
+    """
+    from sqlalchemy import select
+
+    from db import Employee, Session, ShiftCount, refresh_shift_counts
+    from excel_parser.cache import ScheduleCache
+    from excel_parser.store import ScheduleStore
+    from schedule import ScheduleManager, ShiftCountRollup
+    from schedule.journal import JournalWriter, ShiftJournal
+    from scripts.importer import import_excel_to_db
+
+    year, month, path = context["files"][-1]
+    timed(import_excel_to_db, 1, path)
+    writer = JournalWriter(batch_size=100, flush_interval=0.05)
+    journal = ShiftJournal(os.path.join(os.getcwd(), "shift_journal.jsonl"), writer=writer)
+    rollup = ShiftCountRollup(context["directory"])
+    manager = ScheduleManager(context["directory"], ScheduleStore(context["directory"], cache=ScheduleCache()),
+                              journal=journal, rollup=rollup)
+    month_schedule = manager.get_month(year, month)
+    days = [record["day"] for record in month_schedule.schedules]
+    employees = month_schedule.employees
+    codes = sorted(manager.ALLOWED_CODES)
+    rnd = random.Random(0)
+
+    samples = []
+    for index in range(args.iterations):
+        day1, day2 = rnd.choice(days), rnd.choice(days)
+        user1, user2 = rnd.choice(employees), rnd.choice(employees)
+        started = time.perf_counter()
+        if index % 2:
+            manager.swap_shifts(day1, day2, user1, user2, year, month)
+        else:
+            manager.change_status(day1, user1, rnd.choice(codes), year, month)
+        samples.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    writer.stop()
+    stop_seconds = time.perf_counter() - started
+    journal.close()
+
+    def month_counts(session):
+        return {
+            (name, shift): count
+            for name, shift, count in session.execute(
+                select(Employee.name, ShiftCount.shift, ShiftCount.count)
+                .join(Employee, Employee.id == ShiftCount.employee_id)
+                .where(ShiftCount.team == rollup.team, ShiftCount.year == year, ShiftCount.month == month)
+            )
+        }
+
+    matrix = manager.get_month(year, month).matrix
+    in_memory = {
+        (employee, code): count
+        for code in codes
+        for employee, count in matrix.counts(code).items() if count
+    }
+    with Session() as session:
+        stored = month_counts(session)
+        employee_ids = session.execute(select(Employee.id).where(Employee.name.in_(employees))).scalars().all()
+        # Пересчёт в той же транзакции и откат: сводка в базе остаётся такой, как её оставил менеджер
+        refresh_shift_counts(session, rollup.team, year, month, employee_ids)
+        recomputed = month_counts(session)
+        session.rollback()
+
+    stats = writer.stats()
+    return {
+        "change": summarize(samples),
+        "stop_seconds": stop_seconds,
+        "batches": stats["batches"],
+        "flushed": stats["flushed"],
+        "errors": stats["errors"],
+        "max_delay_seconds": stats["max_delay_seconds"],
+        "rollup_matches_memory": stored == in_memory,
+        "rollup_consistent": stored == recomputed,
+    }
+
+
+def bench_handlers(context, args):
+    import bot.handlers as handlers
+    from schedule import TeamRegistry
+
+    year, month, _ = context["files"][-1]
+    manager = context["manager"]
+    month_schedule = manager.get_month(year, month)
+    # Обработчики берут реестр команд и сопоставление пользователей из config — подменяем на данные замера
+    handlers.team_registry = TeamRegistry(default_directory=context["directory"])
+    handlers.team_registry.pin(context["directory"], manager)
+    handlers.telegram_employees = {"1": month_schedule.employees[0]}
+
+    stub = StubBot()
+    handlers.register_handlers(stub)
+    handle_schedule = stub.command_handler("schedule")
+    handle_day_callback = stub.callback_handler(f"day_{year}_{month}_1")
+
+    days = [record["day"] for record in month_schedule.schedules]
+    rnd = random.Random(0)
+
+    def run(handler, make_update):
+        stub.reset()
+        samples = []
+        for index in range(args.iterations):
+            update = make_update(index)
+            started = time.perf_counter()
+            handler(update)
+            samples.append(time.perf_counter() - started)
+        stats = summarize(samples)
+        stats["api_calls"] = len(stub.calls)
+        return stats
+
+    return {
+        "handle_schedule": run(
+            handle_schedule,
+            lambda index: make_message("/schedule", user_id=index % 2, message_id=index),
+        ),
+        "handle_day_callback": run(
+            handle_day_callback,
+            lambda index: make_callback(f"day_{year}_{month}_{rnd.choice(days)}", message_id=index),
+        ),
+    }
+
+
+def bench_notify(context, args):
+    """
+    Рассылка дежурных через настоящий TeleBot на локальную заглушку Bot API
+    (scripts.stub_telegram_api) с её лимитами: проверяет, что все сообщения доставлены
+    и ни в один чат не ушло больше одного сообщения в секунду.
+    """
+    import telebot
+    from telebot import apihelper
+
+    from bot.notifier import DutyNotifier, SendQueue, Subscriptions
+    from schedule import TeamRegistry
+    from scripts.stub_telegram_api import StubTelegramApi
+
+    year, month, _ = context["files"][-1]
+    registry = TeamRegistry(default_directory=context["directory"])
+    registry.pin(context["directory"], context["manager"])
+    subscriptions = Subscriptions(os.path.join(os.getcwd(), "subscriptions.json"))
+    for chat_id in range(1, args.chats + 1):
+        subscriptions.add(chat_id)
+
+    # Заглушка строже очереди (20 против 25 сообщений в секунду): проверяется и повтор после 429
+    stub = StubTelegramApi(port=0, rate=20, chat_interval=1.0)
+    stub.start()
+    api_url = apihelper.API_URL
+    apihelper.API_URL = stub.api_url
+    queue = SendQueue(telebot.TeleBot("0:benchmark", threaded=False).send_message, rate=25)
+    try:
+        notifier = DutyNotifier(registry, subscriptions, queue)
+        started = time.perf_counter()
+        queued = notifier.broadcast(date(year, month, 1))
+        drained = queue.join(timeout=queued / queue.rate + 30)
+        seconds = time.perf_counter() - started
+    finally:
+        queue.stop()
+        stub.shutdown()
+        apihelper.API_URL = api_url
+
+    last_sent = {}
+    spacing_violations = 0
+    for sent_at, chat_id, _ in stub.messages:
+        if chat_id in last_sent and sent_at - last_sent[chat_id] < stub.chat_interval:
+            spacing_violations += 1
+        last_sent[chat_id] = sent_at
+    stats = queue.stats()
+    return {
+        "seconds": seconds,
+        "queued": queued,
+        "sent": stats["sent"],
+        "retried": stats["retried"],
+        "failed": stats["failed"],
+        "rejected_by_api": stub.rejected,
+        "spacing_violations": spacing_violations,
+        "ok": drained and stats["sent"] == queued == len(stub.messages) and spacing_violations == 0,
+    }
+
+
+BENCHMARKS = {
+    "parse_schedule": bench_parse_schedule,
+    "parse_schedule_from_directory": bench_parse_schedule_from_directory,
+    "manager": bench_manager,
+    "roster": bench_roster,
+    "import_excel_to_db": bench_import_excel_to_db,
+    "journal": bench_journal,
+    "handlers": bench_handlers,
+    "notify": bench_notify,
+}
+
+
+def run_suite(args):
+    """
+    Готовит временный каталог с файлами и выполняет выбранные сценарии.
+
+    :return: словарь результатов (параметры, окружение, сценарии).
+    """
+    project_root = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="duty-bench-")
+    # Пакет bot создаёт TeleBot при импорте; в замерах он не используется, нужен только формат токена
+    os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    try:
+        # db.engine использует относительный путь — работаем из временного каталога
+        os.chdir(workdir)
+        directory = os.path.join(workdir, "M")
+        started = time.perf_counter()
+        files = make_schedule_directory(directory, args.employees, args.days, args.months, seed=args.seed)
+        generate_seconds = time.perf_counter() - started
+
+        from excel_parser.cache import ScheduleCache
+        from excel_parser.store import ScheduleStore
+        from schedule import ScheduleManager
+
+        context = {
+            "directory": directory,
+            "files": files,
+            "manager": ScheduleManager(directory, ScheduleStore(directory, cache=ScheduleCache())),
+        }
+        results = {}
+        for name in args.scenarios:
+            results[name] = BENCHMARKS[name](context, args)
+    finally:
+        os.chdir(project_root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "date": date.today().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "params": {
+            "employees": args.employees,
+            "days": args.days,
+            "months": args.months,
+            "repeat": args.repeat,
+            "iterations": args.iterations,
+            "chats": args.chats,
+            "seed": args.seed,
+        },
+        "generate_seconds": generate_seconds,
+        "scenarios": results,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--employees", type=int, default=50)
+    arg_parser.add_argument("--days", type=int, default=None, help="дней в файле (по умолчанию — длина месяца)")
+    arg_parser.add_argument("--months", type=int, default=3, help="число месячных файлов в каталоге")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="повторов для разбора и импорта")
+    arg_parser.add_argument("--iterations", type=int, default=1000, help="вызовов для замеров задержки")
+    arg_parser.add_argument("--chats", type=int, default=100, help="подписанных чатов в сценарии рассылки")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    arg_parser.add_argument("--output", help="файл для JSON (по умолчанию — stdout)")
+    args = arg_parser.parse_args()
+
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Генератор синтетических графиков дежурств в раскладке, которую ждёт parse_schedule.
+
+Запуск из корня проекта:
+    python -m benchmarks.workload /tmp/M --employees 200 --months 12
+"""
+import argparse
+import calendar
+import os
+import random
+from datetime import date
+
+SHIFT_CODES = ["Р", "Р", "Р", "В", "В", "Д", "О", "К", None]
+WEEKDAYS = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+
+def employee_names(employees: int):
+    return [f"Сотрудник {emp:04d}" for emp in range(employees)]
+
+
+def make_workbook(path: str, year: int, month: int, employees: int, days: int = None, seed: int = 0):
+    """
+    Записывает один месячный файл: строка заголовка, строка с ФИО, столбец дат
+    (с днём недели) и блок смен, ниже — итоговая строка.
+
+    :param days: число дней (по умолчанию — длина месяца).
+    :return: путь к созданному файлу.
+    """
+    # openpyxl нужен только генератору: в write-only режиме он пишет построчно и быстро
+    import openpyxl
+
+    days = days or calendar.monthrange(year, month)[1]
+    rnd = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["График дежурств"])
+    sheet.append([])
+    sheet.append([None, "Дата", "д/н"] + employee_names(employees))
+    for day in range(1, days + 1):
+        weekday = WEEKDAYS[(date(year, month, 1).weekday() + day - 1) % 7]
+        sheet.append([None, day, weekday] + [rnd.choice(SHIFT_CODES) for _ in range(employees)])
+    sheet.append([])
+    sheet.append([None, "Итого"])
+    workbook.save(path)
+    return path
+
+
+def make_schedule_directory(directory: str, employees: int, days: int = None, months: int = 1,
+                            last_period=None, seed: int = 0):
+    """
+    Создаёт в каталоге months файлов вида "<месяц> график <год>.xlsx", заканчивая
+    last_period (по умолчанию — текущий месяц, чтобы его нашёл parse_schedule_from_directory).
+
+    :return: список (год, месяц, путь) от старых месяцев к новым.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if last_period is None:
+        today = date.today()
+        last_period = (today.year, today.month)
+    year, month = last_period
+
+    periods = []
+    for _ in range(months):
+        periods.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+    files = []
+    for index, (year, month) in enumerate(reversed(periods)):
+        path = os.path.join(directory, f"{month:02d} график {year}.xlsx")
+        make_workbook(path, year, month, employees, days, seed=seed + index)
+        files.append((year, month, path))
+    return files
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("directory")
+    arg_parser.add_argument("--employees", type=int, default=50)
+    arg_parser.add_argument("--days", type=int, default=None)
+    arg_parser.add_argument("--months", type=int, default=1)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    files = make_schedule_directory(args.directory, args.employees, args.days, args.months, seed=args.seed)
+    for _, _, path in files:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,17 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import telebot
+from telebot import apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
 import logging
-from .handlers import register_handlers  # Функция для регистрации обработчиков команд
+from .handlers import register_handlers, subscriptions  # Функция для регистрации обработчиков команд
+from .notifier import DutyNotifier, SendQueue
+from .tasks import delayed_tasks
+from .webhook import WebhookServer
+from db import init_db
+from config import journal_compact_interval, open_journal, team_registry
+from metrics import MetricsServer, instrument_bot, start_log_dump
 import os
 
 # Настройка логирования (опционально)
@@ -9,15 +20,162 @@ logging.basicConfig(level=logging.INFO)
 # Ваш API-токен бота. Обычно его удобно хранить в переменной окружения или конфиге.
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-# Создаем объект бота TeleBot
-bot = telebot.TeleBot(BOT_TOKEN)
+# Другой адрес Bot API, например локальная заглушка scripts/stub_telegram_api.py:
+# "http://127.0.0.1:8081/bot{0}/{1}" ({0} — токен, {1} — метод).
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL
+    asyncio_helper.API_URL = TELEGRAM_API_URL
+
+# Режим работы: "sync" — TeleBot с пулом потоков (по умолчанию), "async" — AsyncTeleBot на asyncio.
+BOT_MODE = os.getenv("BOT_MODE", "sync")
+
+# Способ получения обновлений: "polling" (по умолчанию) или "webhook" — встроенный HTTP-сервер.
+BOT_TRANSPORT = os.getenv("BOT_TRANSPORT", "polling")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Публичный адрес (https://...), по которому Telegram достучится до сервера.
+# Если не задан, вебхук не регистрируется (например, его ставит балансировщик или он уже настроен).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+
+# Метрики в формате Prometheus. В режиме вебхука они отдаются тем же сервером на METRICS_PATH;
+# в режиме опроса — отдельным сервером, если задан METRICS_PORT.
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+METRICS_PORT = os.getenv("METRICS_PORT")
+# Период (в секундах) записи сводки метрик в лог; 0 — не писать
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+
+# Ежедневная рассылка дежурных подписанным чатам (/subscribe) в NOTIFY_TIME (ЧЧ:ММ); пусто — выключена.
+NOTIFY_TIME = os.getenv("NOTIFY_TIME", "08:00")
+# Ограничения Telegram: всего сообщений в секунду и минимальный интервал между сообщениями в один чат
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "25"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "5"))
+
+
+def create_bot(mode: str = BOT_MODE, transport: str = BOT_TRANSPORT):
+    """
+    Создаёт объект бота для выбранного режима.
+    """
+    if mode == "async":
+        return AsyncTeleBot(BOT_TOKEN)
+    if mode == "sync":
+        # В режиме вебхука обработчики выполняет пул вебхук-сервера,
+        # собственный пул потоков TeleBot не нужен.
+        return telebot.TeleBot(BOT_TOKEN, threaded=transport != "webhook")
+    raise ValueError(f"Неизвестный режим бота: {mode}")
+
+
+# Создаем объект бота (TeleBot или AsyncTeleBot); вызовы API учитываются в метриках
+bot = instrument_bot(create_bot())
+
+
+def create_notifier(send_bot=None):
+    """
+    Создаёт рассылку дежурных с очередью отправки.
+
+    Очередь отправляет сообщения из своих потоков, поэтому ей нужен синхронный TeleBot;
+    при BOT_MODE=async для рассылки создаётся отдельный синхронный клиент с тем же токеном.
+    """
+    if send_bot is None:
+        send_bot = bot
+        if isinstance(bot, AsyncTeleBot):
+            send_bot = instrument_bot(telebot.TeleBot(BOT_TOKEN, threaded=False))
+
+    def on_failure(chat_id, exc):
+        # 403: бота удалили из чата или заблокировали — подписка больше не нужна
+        if getattr(exc, "error_code", None) == 403:
+            subscriptions.remove(chat_id)
+
+    queue = SendQueue(
+        send_bot.send_message,
+        rate=NOTIFY_RATE,
+        per_chat_interval=NOTIFY_CHAT_INTERVAL,
+        workers=NOTIFY_WORKERS,
+        max_retries=NOTIFY_MAX_RETRIES,
+        on_failure=on_failure,
+    )
+    return DutyNotifier(team_registry, subscriptions, queue, send_time=NOTIFY_TIME)
+
+# Сжатие журнала (перезапись файла с fsync) идёт в своём потоке: в delayed_tasks
+# только ждёт своего часа, чтобы не задерживать удаление сообщений с календарём
+_compact_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-compact")
+
+
+def compact_journal_periodically(interval: float = journal_compact_interval):
+    """
+    Сжимает журналы смен команд сейчас и затем каждые interval секунд после окончания предыдущего сжатия.
+    """
+    _compact_executor.submit(_compact_journal, interval)
+
+
+def _compact_journal(interval: float):
+    try:
+        # Журналы всех загруженных команд, включая команду по умолчанию (она закреплена в реестре)
+        for directory, manager in team_registry.managers():
+            try:
+                manager.compact_journal()
+            except Exception:
+                logging.getLogger(__name__).exception("Не удалось сжать журнал смен команды %s", directory)
+    finally:
+        if interval > 0:
+            delayed_tasks.call_later(interval, compact_journal_periodically, interval)
+
 
 def run_bot():
     """
-    Инициализирует и запускает бота, используя TeleBot.
+    Инициализирует и запускает бота в режиме BOT_MODE через BOT_TRANSPORT.
     """
+    # База: недостающие таблицы (в том числе сводка shift_counts для /stats) создаются до первого запроса
+    init_db()
+    # Журнал смен: изменения переживают перезапуск и пишутся в базу
+    open_journal()
+    compact_journal_periodically()
+
     # Регистрируем обработчики команд и сообщений
     register_handlers(bot)
-    
+
+    if METRICS_LOG_INTERVAL > 0:
+        start_log_dump(METRICS_LOG_INTERVAL)
+
+    if NOTIFY_TIME:
+        create_notifier().start()
+
+    if BOT_TRANSPORT == "webhook":
+        run_webhook()
+        return
+    if BOT_TRANSPORT != "polling":
+        raise ValueError(f"Неизвестный способ получения обновлений: {BOT_TRANSPORT}")
+
+    if METRICS_PORT:
+        MetricsServer(port=int(METRICS_PORT), path=METRICS_PATH).start()
+
+    if isinstance(bot, AsyncTeleBot):
+        # Асинхронный опрос: обработчики выполняются как корутины в одном цикле событий
+        asyncio.run(bot.polling(non_stop=True))
+        return
+
     # Запускаем опрос (polling). none_stop=True означает, что бот будет работать без остановок.
     bot.polling(none_stop=True)
+
+
+def run_webhook():
+    """
+    Запускает встроенный вебхук-сервер вместо опроса.
+    """
+    server = WebhookServer(
+        bot,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        workers=WEBHOOK_WORKERS,
+        metrics_path=METRICS_PATH,
+    )
+    if WEBHOOK_URL:
+        server.set_webhook(WEBHOOK_URL)
+    server.serve_forever()
@@ -1,100 +1,324 @@
+import asyncio
+
 import telebot
 from telebot import types
-import calendar
+from telebot.async_telebot import AsyncTeleBot
 from datetime import datetime
-import time
 
 
 from schedule import ScheduleManager
-from config import schedule_manager, path_to_file
-from excel_parser import parse_schedule_from_directory
+from schedule.matrix import SHIFT_CODES
+from config import team_registry, telegram_employees, subscriptions_path
+from db import shift_totals
+from metrics import observe_handler
+
+from .keyboards import calendar_keyboard, DEFAULT_LOCALE, WEEKDAY_LABELS
+from .notifier import Subscriptions
+from .tasks import delayed_tasks
+
+# Через сколько секунд удалять сообщение с календарём после выбора дня
+DELETE_DELAY = 1
+
+WEEKDAYS = WEEKDAY_LABELS[DEFAULT_LOCALE]
 
+NOT_FOUND_TEXT = "Расписание для текущего месяца не найдено. Добавьте файл в папку excel_parser/data/M."
+MONTH_NOT_FOUND_TEXT = "Расписание на этот месяц не найдено."
+SUBSCRIBED_TEXT = "Чат подписан на ежедневную рассылку дежурных."
+ALREADY_SUBSCRIBED_TEXT = "Чат уже подписан на рассылку."
+UNSUBSCRIBED_TEXT = "Чат отписан от рассылки."
+NOT_SUBSCRIBED_TEXT = "Чат не был подписан на рассылку."
+STATS_NOT_FOUND_TEXT = "Расписание для этого чата не найдено."
+STATS_USAGE_TEXT = "Использование: /stats [месяц|квартал|год]"
+
+# Периоды /stats: слово → число месяцев в периоде (период выровнен по началу года)
+STATS_PERIODS = {
+    "месяц": 1, "month": 1,
+    "квартал": 3, "quarter": 3,
+    "год": 12, "year": 12,
+}
+DEFAULT_STATS_PERIOD = "квартал"
+
+# Чаты, подписанные на ежедневную рассылку (её отправляет bot.notifier.DutyNotifier)
+subscriptions = Subscriptions(subscriptions_path)
+
+# Фоновые задачи асинхронного режима: держим ссылки, чтобы их не собрал сборщик мусора
+_background_tasks = set()
 
 
 def register_handlers(bot):
+    """
+    Регистрирует обработчики команд. Работает и с обычным TeleBot,
+    и с AsyncTeleBot: логика ответов общая, различается только способ вызова API.
+    """
+    if isinstance(bot, AsyncTeleBot):
+        _register_async_handlers(bot)
+    else:
+        _register_sync_handlers(bot)
+
+
+def _register_sync_handlers(bot):
     @bot.message_handler(commands=['schedule'])
+    @observe_handler("schedule")
     def handle_schedule(message):
-
-        # Пытаемся загрузить расписание из каталога, где лежат Excel-файлы
-        employees, schedules = parse_schedule_from_directory(path_to_file)
-        if employees is None or schedules is None:
-            print('none')
-            bot.send_message(message.chat.id, "Расписание для текущего месяца не найдено. Добавьте файл в папку excel_parser/data/M.")
+        markup = build_schedule_markup(message.from_user.id if message.from_user else None,
+                                       chat_id=message.chat.id)
+        if markup is None:
+            bot.send_message(message.chat.id, NOT_FOUND_TEXT)
             return  # Прерываем обработку, если файл не найден
-        
-        now = datetime.now()
-        year = now.year
-        month = now.month
-
-        markup = types.InlineKeyboardMarkup()
-
-        # Первая строка: заголовок с днями недели
-        days_of_week = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        header_buttons = [
-            types.InlineKeyboardButton(text=day, callback_data="ignore")
-            for day in days_of_week
-        ]
-        markup.row(*header_buttons)
-
-        # Получаем календарь месяца: список недель, где 0 означает отсутствие дня
-        weeks = calendar.monthcalendar(year, month)
-        for week in weeks:
-            row_buttons = []
-            for day in week:
-                if day == 0:
-                    # Пустая кнопка для выравнивания
-                    row_buttons.append(types.InlineKeyboardButton(text=" ", callback_data="ignore"))
-                else:
-                    row_buttons.append(types.InlineKeyboardButton(text=str(day), callback_data=f"day_{day}"))
-            markup.row(*row_buttons)
 
         bot.send_message(message.chat.id, "Choose date:", reply_markup=markup)
 
 
+    @bot.message_handler(commands=['subscribe', 'unsubscribe'])
+    @observe_handler("subscribe")
+    def handle_subscribe(message):
+        bot.send_message(message.chat.id, toggle_subscription(message))
+
+
+    @bot.message_handler(commands=['stats'])
+    @observe_handler("stats")
+    def handle_stats(message):
+        bot.send_message(message.chat.id, build_stats_reply(
+            message.text, message.from_user.id if message.from_user else None, message.chat.id))
+
+
     @bot.callback_query_handler(func=lambda call: call.data.startswith("day_"))
+    @observe_handler("day_callback")
     def handle_day_callback(call):
+        result, error = build_day_reply(call.data, call.message.chat.id)
+        if error is not None:
+            bot.answer_callback_query(call.id, text=error)
+            return
 
-        day_str = call.data.split("_")[1]
-        try:
-            day = int(day_str)
-        except ValueError:
-            bot.answer_callback_query(call.id, text="Неверное значение дня.")
+        bot.send_message(call.message.chat.id, result)
+
+        # Удаление календаря откладывается в планировщик, поток обработчика сразу свободен
+        delayed_tasks.call_later(DELETE_DELAY, bot.delete_message, call.message.chat.id, call.message.message_id)
+
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith("month_"))
+    @observe_handler("month_callback")
+    def handle_month_callback(call):
+        markup = build_month_markup(call.data, call.from_user.id if call.from_user else None,
+                                    call.message.chat.id)
+        if markup is None:
+            bot.answer_callback_query(call.id, text=MONTH_NOT_FOUND_TEXT)
             return
 
-        schedule = schedule_manager.get_day_schedule(int(day))
-        if not schedule:
-            bot.answer_callback_query(call.id, text="Расписание на этот день не найдено.")
+        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=markup)
+        bot.answer_callback_query(call.id)
+
+
+def _register_async_handlers(bot):
+    @bot.message_handler(commands=['schedule'])
+    @observe_handler("schedule")
+    async def handle_schedule(message):
+        markup = build_schedule_markup(message.from_user.id if message.from_user else None,
+                                       chat_id=message.chat.id)
+        if markup is None:
+            await bot.send_message(message.chat.id, NOT_FOUND_TEXT)
             return
 
-        employees = []
+        await bot.send_message(message.chat.id, "Choose date:", reply_markup=markup)
 
-        for employee, shift in schedule.items():
-            if shift == "Д":
-                employees.append(employee)
-        
 
-        # Предполагаем, что расписание для текущего месяца,
-        # получаем текущий год и месяц
-        now = datetime.now()
-        year = now.year
-        month = now.month
-        try:
-            chosen_date = datetime(year, month, day)
-        except ValueError:
-            bot.answer_callback_query(call.id, text="Неверная дата.")
+    @bot.message_handler(commands=['subscribe', 'unsubscribe'])
+    @observe_handler("subscribe")
+    async def handle_subscribe(message):
+        await bot.send_message(message.chat.id, toggle_subscription(message))
+
+
+    @bot.message_handler(commands=['stats'])
+    @observe_handler("stats")
+    async def handle_stats(message):
+        await bot.send_message(message.chat.id, build_stats_reply(
+            message.text, message.from_user.id if message.from_user else None, message.chat.id))
+
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith("day_"))
+    @observe_handler("day_callback")
+    async def handle_day_callback(call):
+        result, error = build_day_reply(call.data, call.message.chat.id)
+        if error is not None:
+            await bot.answer_callback_query(call.id, text=error)
             return
 
-        # В Python weekday() возвращает 0 для понедельника, 6 для воскресенья
-        weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        weekday_abbr = weekdays[chosen_date.weekday()]
+        await bot.send_message(call.message.chat.id, result)
 
-        result = f"({day},{weekday_abbr}) деж:\n" + "\n".join(employees)
+        task = asyncio.create_task(_delete_later(bot, call.message.chat.id, call.message.message_id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-        bot.send_message(call.message.chat.id, result)
 
-        time.sleep(1)
+    @bot.callback_query_handler(func=lambda call: call.data.startswith("month_"))
+    @observe_handler("month_callback")
+    async def handle_month_callback(call):
+        markup = build_month_markup(call.data, call.from_user.id if call.from_user else None,
+                                    call.message.chat.id)
+        if markup is None:
+            await bot.answer_callback_query(call.id, text=MONTH_NOT_FOUND_TEXT)
+            return
+
+        await bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=markup)
+        await bot.answer_callback_query(call.id)
+
+
+async def _delete_later(bot, chat_id, message_id):
+    await asyncio.sleep(DELETE_DELAY)
+    await bot.delete_message(chat_id, message_id)
+
+
+def toggle_subscription(message) -> str:
+    """
+    Подписывает (/subscribe) или отписывает (/unsubscribe) чат от рассылки дежурных.
+
+    :return: текст ответа.
+    """
+    command = (message.text or "").split()[0].split("@")[0].lstrip("/")
+    if command == "unsubscribe":
+        return UNSUBSCRIBED_TEXT if subscriptions.remove(message.chat.id) else NOT_SUBSCRIBED_TEXT
+    return SUBSCRIBED_TEXT if subscriptions.add(message.chat.id) else ALREADY_SUBSCRIBED_TEXT
+
+
+def build_stats_reply(text: str, user_id=None, chat_id=None, today=None) -> str:
+    """
+    Ответ на /stats [месяц|квартал|год] (по умолчанию — текущий квартал).
+
+    Если пользователь сопоставлен с сотрудником (telegram_employees), выводится число дней
+    каждого кода смены у него за период, иначе — число дежурств у каждого сотрудника команды
+    (состав — по последнему месяцу периода, для которого у команды есть файл).
+    Счёт идёт по сводке shift_counts команды в базе (db.shift_totals), которую поддерживает
+    менеджер команды. Перед запросом сводка сверяется с файлами периода (sync_rollup):
+    перечитываются только месяцы, чей файл изменился с последнего пересчёта (с .snap это дёшево).
+    """
+    args = (text or "").split()[1:]
+    word = args[0].lower() if args else DEFAULT_STATS_PERIOD
+    if word not in STATS_PERIODS or len(args) > 1:
+        return STATS_USAGE_TEXT
+
+    manager = team_registry.manager_for(chat_id)
+    if manager is None:
+        return STATS_NOT_FOUND_TEXT
+
+    today = today or datetime.now().date()
+    length = STATS_PERIODS[word]
+    first_month = (today.month - 1) // length * length + 1
+    start, end = (today.year, first_month), (today.year, first_month + length - 1)
+    period = f"{first_month:02d}.{today.year}" if length == 1 else \
+        f"{first_month:02d}–{first_month + length - 1:02d}.{today.year}"
+
+    manager.sync_rollup(start, end)
+    rollup_team = manager.rollup.team if manager.rollup is not None else None
+
+    employee = telegram_employees.get(str(user_id)) if user_id is not None else None
+    if employee is not None:
+        counts = shift_totals(start, end, employee, team=rollup_team)
+        if not counts:
+            return f"{employee}: за {period} смен нет."
+        order = [code for code in SHIFT_CODES if code in counts] + sorted(set(counts) - set(SHIFT_CODES))
+        return f"{employee}, смены за {period}:\n" + "\n".join(f"{code} — {counts[code]}" for code in order)
+
+    periods = [tuple(p) for p in manager.available_periods() if start <= tuple(p) <= end]
+    month_schedule = manager.get_month(*max(periods)) if periods else None
+    if month_schedule is None:
+        return f"За {period} расписания нет."
+    team = month_schedule.employees
+    totals = shift_totals(start, end, employees=team, team=rollup_team)
+    duties = sorted(((totals.get(name, {}).get(ScheduleManager.DUTY_CODE, 0), name) for name in team),
+                    key=lambda item: (-item[0], item[1]))
+    return f"Дежурства за {period}:\n" + "\n".join(f"{name} — {count}" for count, name in duties)
+
+
+def build_schedule_markup(user_id=None, year: int = None, month: int = None, chat_id=None):
+    """
+    Возвращает клавиатуру-календарь месяца (по умолчанию текущего) для команды /schedule.
+
+    Клавиатура берётся из кэша calendar_keyboard уже сериализованной. Если пользователь
+    сопоставлен с сотрудником (telegram_employees), его дни дежурств отмечаются.
+
+    :param user_id: Telegram id пользователя, запросившего календарь.
+    :param chat_id: id чата — по нему реестр команд выбирает расписание.
+    :return: JSON-строка клавиатуры или None, если расписание за месяц не найдено.
+    """
+    # Месяц берётся из хранилища менеджера команды: файл разбирается при первом обращении
+    # и перечитывается только если он изменился.
+    month_schedule = _get_month(chat_id, year, month)
+    if month_schedule is None:
+        print('none')
+        return None
+
+    marked_days = frozenset()
+    employee = telegram_employees.get(str(user_id)) if user_id is not None else None
+    if employee is not None:
+        marked_days = frozenset(month_schedule.employee_days(employee))
+
+    return calendar_keyboard(month_schedule.year, month_schedule.month, DEFAULT_LOCALE, marked_days)
+
+
+def build_month_markup(callback_data: str, user_id=None, chat_id=None):
+    """
+    Клавиатура для кнопок навигации "month_<год>_<месяц>".
+
+    :return: JSON-строка клавиатуры или None, если данные неверны или месяца нет.
+    """
+    try:
+        _, year_str, month_str = callback_data.split("_")
+        year, month = int(year_str), int(month_str)
+    except ValueError:
+        return None
+    if not 1 <= month <= 12:
+        return None
+    return build_schedule_markup(user_id, year, month, chat_id)
+
+
+def build_day_reply(callback_data: str, chat_id=None):
+    """
+    Формирует ответ на нажатие дня в календаре.
+
+    :param callback_data: данные кнопки вида "day_<год>_<месяц>_<день>"
+                          (или "day_<день>" — текущий месяц, у старых клавиатур).
+    :param chat_id: id чата — по нему реестр команд выбирает расписание.
+    :return: кортеж (текст ответа, текст ошибки); одно из значений — None.
+    """
+    parts = callback_data.split("_")[1:]
+    try:
+        values = [int(part) for part in parts]
+    except ValueError:
+        return None, "Неверное значение дня."
+
+    if len(values) == 3:
+        year, month, day = values
+    elif len(values) == 1:
+        # Старый формат кнопки: день текущего месяца
+        now = datetime.now()
+        year, month, day = now.year, now.month, values[0]
+    else:
+        return None, "Неверное значение дня."
+
+    try:
+        chosen_date = datetime(year, month, day)
+    except ValueError:
+        return None, "Неверная дата."
+
+    # Один снимок месяца на весь ответ: параллельная замена смен не разорвёт его
+    month_schedule = _get_month(chat_id, year, month)
+    schedule = month_schedule.day(day) if month_schedule is not None else None
+    if not schedule:
+        return None, "Расписание на этот день не найдено."
+
+    # Список дежурных на день берётся из индекса снимка
+    employees = month_schedule.on_duty(day)
 
-        bot.delete_message(call.message.chat.id, call.message.message_id)
+    # В Python weekday() возвращает 0 для понедельника, 6 для воскресенья
+    weekday_abbr = WEEKDAYS[chosen_date.weekday()]
 
+    return f"({day},{weekday_abbr}) деж:\n" + "\n".join(employees), None
 
 
+def _get_month(chat_id, year: int = None, month: int = None):
+    """
+    Снимок месяца из менеджера команды чата или None, если чат не привязан к команде
+    или расписания за месяц нет.
+    """
+    manager = team_registry.manager_for(chat_id)
+    return manager.get_month(year, month) if manager is not None else None
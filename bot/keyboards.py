@@ -0,0 +1,78 @@
+import calendar
+from functools import lru_cache
+
+from telebot import types
+
+# Подписи дней недели (понедельник — первый) для поддерживаемых языков
+WEEKDAY_LABELS = {
+    "ru": ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"],
+    "en": ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"],
+}
+MONTH_NAMES = {
+    "ru": ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+           "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"],
+    "en": ["January", "February", "March", "April", "May", "June",
+           "July", "August", "September", "October", "November", "December"],
+}
+DEFAULT_LOCALE = "ru"
+
+# Отметка дней, в которые дежурит запросивший календарь сотрудник
+DUTY_MARK = "•"
+
+
+@lru_cache(maxsize=512)
+def calendar_keyboard(year: int, month: int, locale: str = DEFAULT_LOCALE,
+                      marked_days: frozenset = frozenset()) -> str:
+    """
+    Возвращает клавиатуру-календарь месяца, уже сериализованную в JSON.
+
+    Результат кэшируется по (year, month, locale, marked_days) и переиспользуется
+    между вызовами и чатами: Telegram API принимает reply_markup строкой,
+    поэтому на горячем пути не создаются объекты кнопок и не кодируется JSON.
+
+    Первая строка — навигация по месяцам ("«" / "»" с callback_data "month_<год>_<месяц>"),
+    кнопки дней несут полную дату: "day_<год>_<месяц>_<день>".
+
+    :param marked_days: дни, которые нужно выделить (например, дежурства пользователя).
+    """
+    markup = types.InlineKeyboardMarkup()
+
+    # Навигация: предыдущий месяц, название текущего, следующий месяц
+    prev_year, prev_month = shift_month(year, month, -1)
+    next_year, next_month = shift_month(year, month, 1)
+    month_names = MONTH_NAMES.get(locale, MONTH_NAMES[DEFAULT_LOCALE])
+    markup.row(
+        types.InlineKeyboardButton(text="«", callback_data=f"month_{prev_year}_{prev_month}"),
+        types.InlineKeyboardButton(text=f"{month_names[month - 1]} {year}", callback_data="ignore"),
+        types.InlineKeyboardButton(text="»", callback_data=f"month_{next_year}_{next_month}"),
+    )
+
+    # Первая строка: заголовок с днями недели
+    header_buttons = [
+        types.InlineKeyboardButton(text=day, callback_data="ignore")
+        for day in WEEKDAY_LABELS.get(locale, WEEKDAY_LABELS[DEFAULT_LOCALE])
+    ]
+    markup.row(*header_buttons)
+
+    # Получаем календарь месяца: список недель, где 0 означает отсутствие дня
+    weeks = calendar.monthcalendar(year, month)
+    for week in weeks:
+        row_buttons = []
+        for day in week:
+            if day == 0:
+                # Пустая кнопка для выравнивания
+                row_buttons.append(types.InlineKeyboardButton(text=" ", callback_data="ignore"))
+            else:
+                text = f"{day}{DUTY_MARK}" if day in marked_days else str(day)
+                row_buttons.append(types.InlineKeyboardButton(text=text, callback_data=f"day_{year}_{month}_{day}"))
+        markup.row(*row_buttons)
+
+    return markup.to_json()
+
+
+def shift_month(year: int, month: int, delta: int):
+    """
+    Сдвигает (год, месяц) на delta месяцев.
+    """
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
@@ -0,0 +1,353 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import metrics
+
+from .keyboards import DEFAULT_LOCALE, WEEKDAY_LABELS
+from .tasks import delayed_tasks
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriptions:
+    """
+    Чаты, подписанные на ежедневную рассылку дежурных. Хранятся в JSON-файле
+    (список id чатов), файл переписывается целиком при каждом изменении.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._chats = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._chats = set(json.load(f))
+
+    def add(self, chat_id) -> bool:
+        """
+        Подписывает чат. Возвращает False, если он уже был подписан.
+        """
+        with self._lock:
+            if chat_id in self._chats:
+                return False
+            self._chats.add(chat_id)
+            self._save()
+        return True
+
+    def remove(self, chat_id) -> bool:
+        """
+        Отписывает чат. Возвращает False, если он не был подписан.
+        """
+        with self._lock:
+            if chat_id not in self._chats:
+                return False
+            self._chats.discard(chat_id)
+            self._save()
+        return True
+
+    def chats(self):
+        with self._lock:
+            return sorted(self._chats)
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            return chat_id in self._chats
+
+    def __len__(self):
+        with self._lock:
+            return len(self._chats)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(self._chats), f)
+        os.replace(tmp_path, self.path)
+
+
+class _Message:
+    __slots__ = ("chat_id", "text", "kwargs", "attempts")
+
+    def __init__(self, chat_id, text: str, kwargs: dict):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.attempts = 0
+
+
+class SendQueue:
+    """
+    Исходящая очередь сообщений с ограничениями Telegram.
+
+    Диспетчер (один фоновый поток) выдаёт сообщения не чаще rate в секунду на весь
+    бот и не чаще раза в per_chat_interval секунд в один чат; сами вызовы API идут
+    в пуле из workers потоков, чтобы задержка сети не ограничивала скорость.
+    Сообщение, которое пока нельзя отправить в свой чат, не задерживает другие чаты.
+
+    Ответ 429 откладывает сообщение (и весь его чат) на retry_after из ответа,
+    сетевые ошибки и 5xx — на экспоненциальную паузу backoff * 2^попытка
+    (не больше max_backoff). После max_retries неудач или при другой ошибке
+    (например, 403 — бота удалили из чата) вызывается on_failure(chat_id, exc).
+
+    Очередь не связана с обработчиками: они отвечают пользователям напрямую.
+    """
+
+    def __init__(self, send, rate: float = 25.0, per_chat_interval: float = 1.0, workers: int = 8,
+                 max_retries: int = 5, backoff: float = 1.0, max_backoff: float = 60.0, on_failure=None):
+        """
+        :param send: функция send(chat_id, text, **kwargs), например bot.send_message.
+        """
+        self.send = send
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_failure = on_failure
+        self._condition = threading.Condition()
+        # (время готовности, порядковый номер, сообщение)
+        self._heap = []
+        self._counter = itertools.count()
+        # Ближайшее время, когда можно писать в чат / отправлять следующее сообщение вообще
+        self._chat_ready = {}
+        self._next_slot = 0.0
+        self._in_flight = 0
+        self._pool = None
+        self._thread = None
+        self._stopped = False
+        self._stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    def put(self, chat_id, text: str, **kwargs):
+        """
+        Ставит сообщение в очередь и сразу возвращается.
+        """
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Очередь отправки остановлена.")
+            self._push(time.monotonic(), _Message(chat_id, text, kwargs))
+            self._stats["queued"] += 1
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="send-worker")
+                self._thread = threading.Thread(target=self._run, name="send-queue", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Ждёт, пока очередь опустеет и все отправки завершатся. Возвращает False по таймауту.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while self._heap or self._in_flight:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stop(self):
+        """
+        Останавливает диспетчер; неотправленные сообщения отбрасываются.
+        """
+        with self._condition:
+            self._stopped = True
+            self._heap.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._heap)
+            stats["in_flight"] = self._in_flight
+        return stats
+
+    def _push(self, ready_at: float, message: _Message):
+        heapq.heappush(self._heap, (ready_at, next(self._counter), message))
+
+    def _run(self):
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        while True:
+            with self._condition:
+                message = None
+                while not self._stopped:
+                    if not self._heap or self._in_flight >= self.workers:
+                        self._condition.wait()
+                        continue
+                    now = time.monotonic()
+                    ready_at, _, head = self._heap[0]
+                    chat_ready = self._chat_ready.get(head.chat_id, 0.0)
+                    if chat_ready > max(ready_at, now):
+                        # Чат ещё занят — откладываем только это сообщение, остальные чаты не ждут
+                        heapq.heappop(self._heap)
+                        self._push(chat_ready, head)
+                        continue
+                    wait = max(ready_at, self._next_slot) - now
+                    if wait > 0:
+                        self._condition.wait(wait)
+                        continue
+                    heapq.heappop(self._heap)
+                    message = head
+                    self._next_slot = max(now, self._next_slot) + interval
+                    self._chat_ready[message.chat_id] = now + self.per_chat_interval
+                    self._in_flight += 1
+                    break
+                if self._stopped:
+                    return
+                if len(self._chat_ready) > 10000:
+                    self._chat_ready = {chat: ready for chat, ready in self._chat_ready.items() if ready > now}
+            self._pool.submit(self._deliver, message)
+
+    def _deliver(self, message: _Message):
+        try:
+            self.send(message.chat_id, message.text, **message.kwargs)
+        except Exception as exc:
+            self._handle_error(message, exc)
+        else:
+            metrics.NOTIFY_MESSAGES.inc(result="sent")
+            with self._condition:
+                self._stats["sent"] += 1
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _handle_error(self, message: _Message, exc: Exception):
+        retryable, retry_after = _classify(exc)
+        message.attempts += 1
+        if retryable and message.attempts <= self.max_retries:
+            delay = retry_after if retry_after is not None else \
+                min(self.max_backoff, self.backoff * 2 ** (message.attempts - 1))
+            metrics.NOTIFY_MESSAGES.inc(result="retried")
+            with self._condition:
+                self._stats["retried"] += 1
+                ready_at = time.monotonic() + delay
+                if retry_after is not None:
+                    # 429 относится к чату: не пишем в него до истечения паузы
+                    self._chat_ready[message.chat_id] = max(self._chat_ready.get(message.chat_id, 0.0), ready_at)
+                self._push(ready_at, message)
+            return
+
+        metrics.NOTIFY_MESSAGES.inc(result="failed")
+        with self._condition:
+            self._stats["failed"] += 1
+        logger.warning("Не удалось отправить сообщение в чат %s: %s", message.chat_id, exc)
+        if self.on_failure is not None:
+            try:
+                self.on_failure(message.chat_id, exc)
+            except Exception:
+                logger.exception("Ошибка в обработчике неудачной отправки")
+
+
+def _classify(exc: Exception):
+    """
+    (можно ли повторить, retry_after из ответа 429 или None).
+    """
+    code = getattr(exc, "error_code", None)
+    if code is None:
+        # Сетевая ошибка или таймаут — повторяем
+        return True, None
+    if code == 429:
+        result = getattr(exc, "result_json", None) or {}
+        retry_after = (result.get("parameters") or {}).get("retry_after")
+        return True, float(retry_after) if retry_after is not None else None
+    return code >= 500, None
+
+
+class DutyNotifier:
+    """
+    Ежедневная рассылка дежурных ("Д") на сегодня и завтра подписанным чатам.
+
+    Текст считается один раз на команду (каталог реестра), а не на чат, и ставится
+    в SendQueue для всех её подписчиков. Запуск — каждый день в send_time (ЧЧ:ММ,
+    местное время) через общий планировщик delayed_tasks; сама рассылка (она может
+    разбирать файлы расписаний) идёт в отдельном потоке, чтобы не задерживать
+    другие задачи планировщика, например удаление календарей.
+    """
+
+    def __init__(self, registry, subscriptions: Subscriptions, queue: SendQueue, send_time: str = "08:00",
+                 scheduler=delayed_tasks):
+        self.registry = registry
+        self.subscriptions = subscriptions
+        self.queue = queue
+        self.send_time = datetime.strptime(send_time, "%H:%M").time()
+        self.scheduler = scheduler
+        # Один поток: рассылки не пересекаются, даже если одна затянулась до следующей
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="duty-broadcast")
+
+    def broadcast(self, today: date = None) -> int:
+        """
+        Ставит в очередь рассылку на день today (по умолчанию — сегодня).
+
+        :return: число поставленных сообщений.
+        """
+        today = today or date.today()
+        by_directory = {}
+        for chat_id in self.subscriptions.chats():
+            directory = self.registry.directory_for(chat_id)
+            if directory is not None:
+                by_directory.setdefault(directory, []).append(chat_id)
+
+        queued = 0
+        for directory, chats in by_directory.items():
+            text = build_duty_text(self.registry.manager_for_directory(directory), today)
+            if text is None:
+                continue
+            for chat_id in chats:
+                self.queue.put(chat_id, text)
+            queued += len(chats)
+        logger.info("Рассылка дежурных: %d сообщений для %d команд", queued, len(by_directory))
+        return queued
+
+    def start(self):
+        """
+        Планирует ближайшую рассылку; после каждой рассылки планируется следующая.
+        """
+        self.scheduler.call_later(self._seconds_until_next(), self._run_daily)
+
+    def _run_daily(self):
+        try:
+            self._executor.submit(self._broadcast_logged)
+        finally:
+            self.start()
+
+    def _broadcast_logged(self):
+        try:
+            self.broadcast()
+        except Exception:
+            logger.exception("Ошибка ежедневной рассылки")
+
+    def _seconds_until_next(self, now: datetime = None) -> float:
+        now = now or datetime.now()
+        next_run = datetime.combine(now.date(), self.send_time)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+
+def build_duty_text(manager, today: date):
+    """
+    Текст рассылки: дежурные сегодня и завтра (завтра может быть уже в следующем месяце).
+
+    :return: строка или None, если расписания нет ни на сегодня, ни на завтра.
+    """
+    weekdays = WEEKDAY_LABELS[DEFAULT_LOCALE]
+    lines = []
+    found = False
+    for title, day in (("Сегодня", today), ("Завтра", today + timedelta(days=1))):
+        on_duty = manager.get_on_duty(day.day, day.year, day.month)
+        found = found or on_duty is not None
+        header = f"{title} ({day.day:02d}.{day.month:02d}, {weekdays[day.weekday()]}) деж:"
+        lines.append(header)
+        lines.extend(on_duty or ["—"])
+        lines.append("")
+    return "\n".join(lines).rstrip() if found else None
@@ -0,0 +1,81 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DelayedTasks:
+    """
+    Планировщик отложенных задач на одном фоновом потоке.
+
+    Задачи хранятся в куче по времени запуска; поток спит до ближайшей задачи
+    и просыпается раньше, если добавлена задача с более ранним сроком.
+    Обработчики бота ставят задачу и сразу возвращаются, не занимая свой поток
+    на time.sleep.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def call_later(self, delay: float, func, *args, **kwargs):
+        """
+        Запланировать вызов func(*args, **kwargs) через delay секунд.
+        """
+        run_at = time.monotonic() + delay
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Планировщик задач остановлен.")
+            heapq.heappush(self._queue, (run_at, next(self._counter), func, args, kwargs))
+            self._ensure_thread()
+            self._condition.notify()
+
+    def shutdown(self):
+        """
+        Останавливает фоновый поток; невыполненные задачи отбрасываются.
+        """
+        with self._condition:
+            self._stopped = True
+            self._queue.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="delayed-tasks", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    timeout = self._queue[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, func, args, kwargs = heapq.heappop(self._queue)
+
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Ошибка в отложенной задаче %r", func)
+
+
+# Общий планировщик процесса
+delayed_tasks = DelayedTasks()
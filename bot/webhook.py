@@ -0,0 +1,184 @@
+import asyncio
+import hmac
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передаёт secret_token, указанный при set_webhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Предел размера тела запроса: обновления Telegram — единицы килобайт
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookServer:
+    """
+    Встроенный HTTP-сервер для приёма обновлений Telegram через вебхук.
+
+    POST на path с JSON-обновлением проверяется по секретному токену, сразу получает
+    ответ 200, а само обновление обрабатывается в пуле из workers потоков
+    (для AsyncTeleBot — в отдельном цикле событий). GET на "/" отвечает "ok"
+    и годится для проверки живости за балансировщиком, GET на metrics_path
+    отдаёт метрики в формате Prometheus.
+
+    Сервер можно проверить локально, отправив записанное обновление:
+        curl -X POST -H "X-Telegram-Bot-Api-Secret-Token: <секрет>" \
+             --data @update.json http://127.0.0.1:8080/webhook
+    """
+
+    def __init__(self, bot, host: str = "0.0.0.0", port: int = 8080, path: str = "/webhook",
+                 secret_token: str = None, workers: int = 4, metrics_path: str = "/metrics"):
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.metrics_path = metrics_path
+        self._loop = None
+        self._loop_thread = None
+        self._pool = None
+        if isinstance(bot, AsyncTeleBot):
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name="webhook-loop", daemon=True)
+            self._loop_thread.start()
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook-worker")
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        """
+        Фактический (host, port) сервера — полезно, если задан порт 0.
+        """
+        return self._httpd.server_address
+
+    def set_webhook(self, base_url: str):
+        """
+        Регистрирует вебхук в Telegram: base_url + path с секретным токеном.
+        """
+        url = base_url.rstrip("/") + self.path
+        if self._loop is not None:
+            self._run_coroutine(self.bot.set_webhook(url=url, secret_token=self.secret_token)).result()
+        else:
+            self.bot.set_webhook(url=url, secret_token=self.secret_token)
+        logger.info("Вебхук зарегистрирован: %s", url)
+
+    def serve_forever(self):
+        if not self.secret_token:
+            logger.warning("Секретный токен вебхука не задан (WEBHOOK_SECRET): принимается любой POST на %s",
+                           self.path)
+        logger.info("Вебхук-сервер слушает %s:%s%s", *self.address, self.path)
+        self._httpd.serve_forever()
+
+    def start(self):
+        """
+        Запускает сервер в фоновом потоке (удобно для локальных проверок).
+        """
+        thread = threading.Thread(target=self.serve_forever, name="webhook-server", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def dispatch(self, payload):
+        """
+        Передаёт обновление (JSON-строка или уже разобранный словарь) на обработку,
+        не дожидаясь её завершения.
+
+        :raises ValueError: если payload — не JSON-объект обновления.
+        """
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        if not isinstance(payload, dict) or "update_id" not in payload:
+            raise ValueError("Обновление должно быть JSON-объектом с update_id.")
+        update = types.Update.de_json(payload)
+        if self._loop is not None:
+            future = self._run_coroutine(self.bot.process_new_updates([update]))
+            future.add_done_callback(lambda done: self._log_failure(done, update))
+        else:
+            self._pool.submit(self._process, update)
+
+    def _process(self, update):
+        try:
+            self.bot.process_new_updates([update])
+        except Exception:
+            logger.exception("Ошибка обработки обновления %s", update.update_id)
+
+    @staticmethod
+    def _log_failure(future, update):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logger.error("Ошибка обработки обновления %s", update.update_id, exc_info=exc)
+
+    def _run_coroutine(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _check_secret(self, value) -> bool:
+        if not self.secret_token:
+            return True
+        return value is not None and hmac.compare_digest(value.encode(), self.secret_token.encode())
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/":
+                    self._reply(200, b"ok")
+                elif server.metrics_path and self.path == server.metrics_path:
+                    self._reply(200, metrics.REGISTRY.render().encode("utf-8"), metrics.CONTENT_TYPE)
+                else:
+                    self._reply(404, b"not found")
+
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404, b"not found")
+                    return
+                if not server._check_secret(self.headers.get(SECRET_HEADER)):
+                    self._reply(403, b"forbidden")
+                    return
+
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    if length < 0:
+                        raise ValueError(f"отрицательный Content-Length: {length}")
+                    if length > MAX_BODY_SIZE:
+                        logger.warning("Отклонено обновление размером %d байт", length)
+                        self.close_connection = True
+                        self._reply(413, b"payload too large")
+                        return
+                    server.dispatch(json.loads(self.rfile.read(length)))
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    # Не JSON, не объект или объект, из которого не собирается Update
+                    logger.warning("Отклонено некорректное обновление: %s", e)
+                    self._reply(400, b"bad request")
+                    return
+                self._reply(200, b"")
+
+            def log_message(self, format, *args):
+                logger.debug("webhook: " + format, *args)
+
+            def _reply(self, status: int, body: bytes, content_type: str = None):
+                self.send_response(status)
+                if content_type is not None:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
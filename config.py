@@ -1,7 +1,121 @@
 # config.py
+import json
+import os
+import threading
+
+from excel_parser import schedule_cache, ScheduleCache, ScheduleStore
 from schedule.manager import ScheduleManager
+from schedule.registry import TeamRegistry
+from schedule.journal import ShiftJournal, JournalWriter
+from schedule.rollup import ShiftCountRollup
 
 path_to_file = "excel_parser/data/M"
 
-schedule_manager = ScheduleManager(path_to_file)
-    
\ No newline at end of file
+# Движок разбора Excel: "pandas" (по умолчанию) или "openpyxl" —
+# потоковое чтение без pandas, с меньшим пиковым расходом памяти.
+parser_backend = os.getenv("SCHEDULE_PARSER", "pandas")
+schedule_cache.set_backend(parser_backend)
+
+# Как часто (в секундах) проверять каталог и файлы расписаний на изменения
+schedule_check_interval = float(os.getenv("SCHEDULE_CHECK_INTERVAL", "2"))
+
+# Журнал замен и смен статуса: переживает перезапуск и пакетно пишется в таблицу schedules.
+# Размер пакета и максимальная задержка сброса в базу настраиваются.
+journal_path = os.getenv("JOURNAL_PATH", "schedule_journal.jsonl")
+journal_batch_size = int(os.getenv("JOURNAL_BATCH_SIZE", "100"))
+journal_flush_interval = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "1"))
+journal_fsync = os.getenv("JOURNAL_FSYNC", "0") == "1"
+# Журнал команды из TEAMS лежит в её каталоге под этим именем
+team_journal_name = os.getenv("TEAM_JOURNAL_NAME", "schedule_journal.jsonl")
+# Как часто (в секундах) удалять из журнала записи, которые уже не нужны (см. ShiftJournal.compact)
+journal_compact_interval = float(os.getenv("JOURNAL_COMPACT_INTERVAL", "3600"))
+
+# Сводка shift_counts для /stats: каждый менеджер команды поддерживает свою (см. schedule.rollup)
+schedule_manager = ScheduleManager(
+    path_to_file,
+    ScheduleStore(path_to_file, check_interval=schedule_check_interval),
+    rollup=ShiftCountRollup(path_to_file),
+)
+
+# Журналы открываются при запуске бота (open_journal), а не при импорте config:
+# скриптам и замерам, которые импортируют config, файлы журналов не нужны
+shift_journal = None
+# каталог команды -> её ShiftJournal; журнал переживает выгрузку менеджера команды из реестра,
+# чтобы заново созданный менеджер не открыл второй писатель того же файла
+_team_journals = {}
+_journals_lock = threading.Lock()
+
+
+def _open_journal_file(path: str) -> ShiftJournal:
+    writer = JournalWriter(batch_size=journal_batch_size, flush_interval=journal_flush_interval)
+    return ShiftJournal(path, writer=writer, fsync=journal_fsync)
+
+
+def open_journal() -> ShiftJournal:
+    """
+    Открывает журналы смен (один раз): журнал команды по умолчанию (JOURNAL_PATH)
+    и журналы уже созданных менеджеров команд. Менеджеры, созданные позже, получают
+    журнал в create_team_manager.
+    """
+    global shift_journal
+    with _journals_lock:
+        if shift_journal is not None:
+            return shift_journal
+        shift_journal = _open_journal_file(journal_path)
+    schedule_manager.attach_journal(shift_journal)
+    for directory, manager in team_registry.managers():
+        if manager is not schedule_manager:
+            manager.attach_journal(open_team_journal(directory))
+    return shift_journal
+
+
+def open_team_journal(directory: str) -> ShiftJournal:
+    """
+    Журнал смен команды из её каталога (team_journal_name), один на каталог.
+    """
+    directory = os.path.normpath(directory)
+    with _journals_lock:
+        journal = _team_journals.get(directory)
+        if journal is None:
+            journal = _open_journal_file(os.path.join(directory, team_journal_name))
+            _team_journals[directory] = journal
+        return journal
+
+# Команды: JSON {"<id чата или группы>": "<каталог с файлами команды>"}.
+# Чаты, которых нет в списке, обслуживает команда по умолчанию (path_to_file).
+teams = json.loads(os.getenv("TEAMS", "{}"))
+# Сколько памяти (МБ) могут занимать загруженные расписания команд; давно не использованные выгружаются
+team_memory_budget = int(os.getenv("TEAM_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+
+
+def create_team_manager(directory: str) -> ScheduleManager:
+    """
+    Единственная фабрика менеджеров команд (её вызывает TeamRegistry). После open_journal
+    менеджер сразу получает журнал своей команды, так что замены переживают перезапуск.
+    Сводку shift_counts команды менеджер поддерживает сам (ShiftCountRollup).
+    """
+    # У каждой команды свой кэш файлов, чтобы выгрузка команды освобождала и его
+    manager = ScheduleManager(
+        directory,
+        ScheduleStore(directory, cache=ScheduleCache(parser_backend), check_interval=schedule_check_interval),
+        rollup=ShiftCountRollup(directory),
+    )
+    if shift_journal is not None:
+        manager.attach_journal(open_team_journal(directory))
+    return manager
+
+
+team_registry = TeamRegistry(
+    teams,
+    default_directory=path_to_file,
+    memory_budget=team_memory_budget,
+    manager_factory=create_team_manager,
+)
+team_registry.pin(path_to_file, schedule_manager)
+
+# Файл со списком чатов, подписанных на ежедневную рассылку дежурных (/subscribe)
+subscriptions_path = os.getenv("SUBSCRIPTIONS_PATH", "subscriptions.json")
+
+# Соответствие Telegram id пользователя → ФИО в графике, например '{"123456": "Иванов И.И."}'.
+# Для сопоставленных пользователей в календаре /schedule отмечаются их дни дежурств.
+telegram_employees = json.loads(os.getenv("TELEGRAM_EMPLOYEES", "{}"))
@@ -1,7 +1,16 @@
 # db/__init__.py
 
 from .engine import engine
-from .models import Base, Employee, Schedule
+from .models import Base, Employee, ImportedFile, Schedule, ShiftCount, ShiftCountSource
 from .session import Session
+from .schema import init_db
+from .bulk import (resolve_employee_ids, upsert_schedules, delete_schedules, update_schedule_shifts,
+                   diff_schedules, imported_hashes, record_import, team_key, refresh_shift_counts,
+                   replace_shift_counts, forget_shift_count_source, apply_shift_count_deltas, shift_count_deltas)
+from .queries import duty_on, duties_for, month_grid, shift_totals, shift_count_sources
 
-__all__ = ['engine', 'Base', 'Employee', 'Schedule', 'Session']
+__all__ = ['engine', 'Base', 'Employee', 'ImportedFile', 'Schedule', 'ShiftCount', 'ShiftCountSource', 'Session',
+           'init_db', 'resolve_employee_ids', 'upsert_schedules', 'delete_schedules', 'update_schedule_shifts',
+           'diff_schedules', 'imported_hashes', 'record_import', 'team_key', 'refresh_shift_counts',
+           'replace_shift_counts', 'forget_shift_count_source', 'apply_shift_count_deltas', 'shift_count_deltas', 'duty_on', 'duties_for',
+           'month_grid', 'shift_totals', 'shift_count_sources']
@@ -0,0 +1,274 @@
+# db/bulk.py
+
+import os
+
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import Employee, ImportedFile, Schedule, ShiftCount, ShiftCountSource
+
+
+def resolve_employee_ids(session, names) -> dict:
+    """
+    Возвращает словарь ФИО → id для всех переданных сотрудников.
+
+    Существующие сотрудники находятся одним запросом, недостающие добавляются
+    одной пакетной вставкой (ON CONFLICT DO NOTHING), после чего их id
+    дочитываются ещё одним запросом.
+
+    :param session: открытая сессия SQLAlchemy (транзакцией управляет вызывающий код).
+    :param names: итерируемое ФИО сотрудников.
+    :return: словарь {ФИО: id}.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+
+    ids = dict(session.execute(
+        select(Employee.name, Employee.id).where(Employee.name.in_(names))
+    ).all())
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        session.execute(
+            sqlite_insert(Employee).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in missing],
+        )
+        ids.update(session.execute(
+            select(Employee.name, Employee.id).where(Employee.name.in_(missing))
+        ).all())
+    return ids
+
+
+def upsert_schedules(session, rows) -> int:
+    """
+    Пакетно записывает строки расписания с заменой по ключу (year, month, day, employee_id).
+
+    Повторная запись того же месяца не создаёт дубликатов, а лишь обновляет код смены.
+
+    :param session: открытая сессия SQLAlchemy.
+    :param rows: список словарей {"year", "month", "day", "employee_id", "shift"}.
+    :return: число переданных строк.
+    """
+    if not rows:
+        return 0
+    stmt = sqlite_insert(Schedule)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["year", "month", "day", "employee_id"],
+        set_={"shift": stmt.excluded.shift},
+    )
+    session.execute(stmt, rows)
+    return len(rows)
+
+
+def delete_schedules(session, keys) -> int:
+    """
+    Пакетно удаляет строки расписания по ключам (year, month, day, employee_id).
+
+    :param keys: список словарей {"year", "month", "day", "employee_id"}.
+    :return: число переданных ключей.
+    """
+    if not keys:
+        return 0
+    table = Schedule.__table__
+    stmt = delete(table).where(
+        table.c.year == bindparam("b_year"),
+        table.c.month == bindparam("b_month"),
+        table.c.day == bindparam("b_day"),
+        table.c.employee_id == bindparam("b_employee_id"),
+    )
+    session.connection().execute(stmt, [
+        {"b_year": key["year"], "b_month": key["month"], "b_day": key["day"], "b_employee_id": key["employee_id"]}
+        for key in keys
+    ])
+    return len(keys)
+
+
+def update_schedule_shifts(session, rows) -> int:
+    """
+    Пакетно меняет код смены существующих строк расписания (UPDATE по ключу year, month, day, employee_id).
+
+    :param rows: список словарей {"year", "month", "day", "employee_id", "shift"}.
+    :return: число переданных строк.
+    """
+    if not rows:
+        return 0
+    table = Schedule.__table__
+    stmt = update(table).where(
+        table.c.year == bindparam("b_year"),
+        table.c.month == bindparam("b_month"),
+        table.c.day == bindparam("b_day"),
+        table.c.employee_id == bindparam("b_employee_id"),
+    ).values(shift=bindparam("b_shift"))
+    session.connection().execute(stmt, [
+        {"b_year": row["year"], "b_month": row["month"], "b_day": row["day"],
+         "b_employee_id": row["employee_id"], "b_shift": row["shift"]}
+        for row in rows
+    ])
+    return len(rows)
+
+
+def diff_schedules(session, year: int, month: int, rows):
+    """
+    Сравнивает новые строки месяца с тем, что хранится в базе за (year, month).
+
+    Хранимые строки месяца читаются одним запросом по уникальному индексу.
+
+    :param rows: полный новый набор строк месяца {"year", "month", "day", "employee_id", "shift"}.
+    :return: (inserts, updates, deletes): новые строки, строки со сменившимся кодом
+             (с новым кодом и прежним в "previous"), ключи строк, которых больше нет
+             (с прежним кодом в "previous").
+    """
+    stored = {
+        (day, employee_id): shift
+        for day, employee_id, shift in session.execute(
+            select(Schedule.day, Schedule.employee_id, Schedule.shift)
+            .where(Schedule.year == year, Schedule.month == month)
+        )
+    }
+    inserts, updates = [], []
+    for row in rows:
+        previous = stored.pop((row["day"], row["employee_id"]), None)
+        if previous is None:
+            inserts.append(row)
+        elif previous != row["shift"]:
+            updates.append(dict(row, previous=previous))
+    deletes = [
+        {"year": year, "month": month, "day": day, "employee_id": employee_id, "previous": shift}
+        for (day, employee_id), shift in sorted(stored.items())
+    ]
+    return inserts, updates, deletes
+
+
+def team_key(directory: str) -> str:
+    """
+    Ключ команды в сводке shift_counts: абсолютный нормализованный путь каталога с её файлами.
+    По нему сводки, которые пишут импорт и бот, совпадают, с какого бы пути их ни запустили.
+    """
+    return os.path.normcase(os.path.abspath(directory))
+
+
+def refresh_shift_counts(session, team: str, year: int = None, month: int = None, employee_ids=None) -> None:
+    """
+    Пересчитывает сводку shift_counts команды по строкам schedules одним INSERT ... SELECT GROUP BY.
+
+    Таблица schedules общая для всех команд, поэтому при импорте файла команды
+    считаются только её сотрудники (employee_ids). Отметки shift_count_sources
+    пересчитанных месяцев снимаются: менеджер команды пересчитает их по своему снимку.
+
+    :param team: ключ команды (team_key).
+    :param year, month: месяц для пересчёта; если не заданы — пересчитываются все месяцы.
+    :param employee_ids: id сотрудников команды; None — все сотрудники.
+    """
+    counts = ShiftCount.__table__
+    sources = ShiftCountSource.__table__
+    query = select(literal(team), Schedule.employee_id, Schedule.year, Schedule.month, Schedule.shift,
+                   func.count()).group_by(Schedule.employee_id, Schedule.year, Schedule.month, Schedule.shift)
+    clear = delete(counts).where(counts.c.team == team)
+    forget = delete(sources).where(sources.c.team == team)
+    if year is not None and month is not None:
+        query = query.where(Schedule.year == year, Schedule.month == month)
+        clear = clear.where(counts.c.year == year, counts.c.month == month)
+        forget = forget.where(sources.c.year == year, sources.c.month == month)
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        query = query.where(Schedule.employee_id.in_(employee_ids))
+        clear = clear.where(counts.c.employee_id.in_(employee_ids))
+    session.execute(clear)
+    session.execute(forget)
+    session.execute(insert(counts).from_select(["team", "employee_id", "year", "month", "shift", "count"], query))
+
+
+def replace_shift_counts(session, team: str, year: int, month: int, rows, version) -> int:
+    """
+    Заменяет сводку месяца команды готовыми счётчиками и запоминает версию файла, по которой они посчитаны.
+
+    :param rows: список словарей {"employee_id", "shift", "count"}.
+    :param version: отпечаток файла месяца (mtime_ns, размер).
+    :return: число записанных счётчиков.
+    """
+    session.execute(delete(ShiftCount).where(
+        ShiftCount.team == team, ShiftCount.year == year, ShiftCount.month == month))
+    if rows:
+        session.execute(insert(ShiftCount), [dict(row, team=team, year=year, month=month) for row in rows])
+    stmt = sqlite_insert(ShiftCountSource).values(
+        team=team, year=year, month=month, file_mtime_ns=version[0], file_size=version[1])
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["team", "year", "month"],
+        set_={"file_mtime_ns": stmt.excluded.file_mtime_ns, "file_size": stmt.excluded.file_size},
+    ))
+    return len(rows)
+
+
+def forget_shift_count_source(session, team: str, year: int, month: int) -> None:
+    """
+    Снимает отметку shift_count_sources месяца: менеджер команды пересчитает его сводку при следующей сверке.
+    """
+    session.execute(delete(ShiftCountSource).where(
+        ShiftCountSource.team == team, ShiftCountSource.year == year, ShiftCountSource.month == month))
+
+
+def apply_shift_count_deltas(session, team: str, deltas) -> int:
+    """
+    Применяет к сводке shift_counts команды изменения счётчиков и удаляет обнулившиеся строки.
+
+    :param deltas: словарь {(employee_id, year, month, код): изменение}, например из
+                   shift_count_deltas или из изменений смен (прежний код −1, новый +1).
+    :return: число изменённых счётчиков.
+    """
+    rows = [
+        {"team": team, "employee_id": employee_id, "year": year, "month": month, "shift": shift, "count": delta}
+        for (employee_id, year, month, shift), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return 0
+    stmt = sqlite_insert(ShiftCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["team", "employee_id", "year", "month", "shift"],
+        set_={"count": ShiftCount.count + stmt.excluded["count"]},
+    )
+    session.execute(stmt, rows)
+    session.execute(delete(ShiftCount).where(ShiftCount.team == team, ShiftCount.count <= 0))
+    return len(rows)
+
+
+def shift_count_deltas(inserts=(), updates=(), deletes=()) -> dict:
+    """
+    Изменения сводки shift_counts по результату diff_schedules.
+    """
+    deltas = {}
+
+    def add(row, shift, delta):
+        key = (row["employee_id"], row["year"], row["month"], shift)
+        deltas[key] = deltas.get(key, 0) + delta
+
+    for row in inserts:
+        add(row, row["shift"], 1)
+    for row in updates:
+        add(row, row["previous"], -1)
+        add(row, row["shift"], 1)
+    for key in deletes:
+        add(key, key["previous"], -1)
+    return deltas
+
+
+def imported_hashes(session, hashes) -> set:
+    """
+    Возвращает те из переданных хэшей содержимого, файлы с которыми уже импортированы.
+    """
+    hashes = list(dict.fromkeys(hashes))
+    if not hashes:
+        return set()
+    return set(session.execute(
+        select(ImportedFile.content_hash).where(ImportedFile.content_hash.in_(hashes))
+    ).scalars())
+
+
+def record_import(session, content_hash: str, file_name: str, year: int, month: int, rows: int):
+    """
+    Отмечает файл как импортированный (повторная отметка того же содержимого ничего не меняет).
+    """
+    session.execute(
+        sqlite_insert(ImportedFile).on_conflict_do_nothing(index_elements=["content_hash"]),
+        [{"content_hash": content_hash, "file_name": file_name, "year": year, "month": month, "rows": rows}],
+    )
@@ -1,7 +1,15 @@
 # db/engine.py
 
+import os
+
 from sqlalchemy import create_engine
 
+import metrics
+
 # Создаём engine для подключения к базе SQLite.
 # 'sqlite:///schedule.db' означает, что файл schedule.db будет находиться в той же папке, откуда запущено приложение.
-engine = create_engine('sqlite:///schedule.db', echo=True)
+# Логирование SQL-запросов (echo) включается только явно: DB_ECHO=1.
+engine = create_engine('sqlite:///schedule.db', echo=os.getenv("DB_ECHO", "0") == "1")
+
+# Счётчики запросов (db_queries_total) и их длительность для /metrics
+metrics.instrument_engine(engine)
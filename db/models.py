@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
@@ -15,6 +15,12 @@ class Employee(Base):
 
 class Schedule(Base):
     __tablename__ = 'schedules'
+    __table_args__ = (
+        # Одна запись на сотрудника и день: на этом ключе строится upsert при импорте
+        Index('uq_schedules_day_employee', 'year', 'month', 'day', 'employee_id', unique=True),
+        # История сотрудника за период: WHERE employee_id = ? AND (year, month) ...
+        Index('ix_schedules_employee_period', 'employee_id', 'year', 'month'),
+    )
     
     id = Column(Integer, primary_key=True)
     year = Column(Integer, nullable=False)     # год, например, 2025
@@ -29,3 +35,58 @@ class Schedule(Base):
     def __repr__(self):
         return (f"<Schedule(id={self.id}, year={self.year}, month={self.month}, day={self.day}, "
                 f"employee='{self.employee.name}', shift='{self.shift}')>")
+
+
+class ShiftCount(Base):
+    """
+    Помесячная сводка: сколько дней каждого кода смены у сотрудника в месяце, отдельно по командам.
+
+    Команда (team) — ключ каталога её файлов (см. team_key). Сводку поддерживают импорт
+    (refresh_shift_counts, apply_shift_count_deltas) и менеджер расписаний команды
+    (schedule.rollup), так что статистика за период читает по строке на сотрудника, месяц и код,
+    а не все смены.
+    """
+    __tablename__ = 'shift_counts'
+
+    team = Column(String, primary_key=True)
+    employee_id = Column(Integer, ForeignKey('employees.id'), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    shift = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (f"<ShiftCount(team='{self.team}', employee_id={self.employee_id}, year={self.year}, "
+                f"month={self.month}, shift='{self.shift}', count={self.count})>")
+
+
+class ShiftCountSource(Base):
+    """
+    По какой версии файла (mtime, размер) менеджер команды последний раз пересчитал сводку месяца.
+    Нет строки или другая версия — сводку месяца нужно пересчитать (см. ScheduleManager.sync_rollup).
+    """
+    __tablename__ = 'shift_count_sources'
+
+    team = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    file_mtime_ns = Column(Integer, nullable=False)
+    file_size = Column(Integer, nullable=False)
+
+
+class ImportedFile(Base):
+    """
+    Импортированный файл расписания: по хэшу содержимого повторный импорт того же файла пропускается.
+    """
+    __tablename__ = 'imported_files'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String, unique=True, nullable=False)  # sha256 содержимого файла (hex)
+    file_name = Column(String, nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=False)                       # число записанных смен
+    imported_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<ImportedFile(file_name='{self.file_name}', year={self.year}, month={self.month})>"
@@ -0,0 +1,181 @@
+# db/queries.py
+
+from datetime import date
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import contains_eager
+
+from .models import Employee, Schedule, ShiftCount, ShiftCountSource
+from .session import Session
+
+DUTY_CODE = "Д"
+
+
+def duty_on(day: date, code: str = DUTY_CODE, session=None):
+    """
+    Возвращает записи с указанным кодом смены (по умолчанию — дежурства) на дату.
+
+    Один запрос по уникальному индексу (year, month, day, employee_id) с JOIN на employees:
+    сотрудник каждой записи загружен сразу, обращение к Schedule.employee не делает запросов.
+
+    :param day: дата (datetime.date).
+    :param code: код смены.
+    :param session: открытая сессия; если не передана, создаётся и закрывается своя.
+    :return: список Schedule, упорядоченный по ФИО.
+    """
+    stmt = (
+        _with_employee(select(Schedule))
+        .where(Schedule.year == day.year, Schedule.month == day.month, Schedule.day == day.day)
+        .where(Schedule.shift == code)
+        .order_by(Employee.name)
+    )
+    return _fetch(stmt, session)
+
+
+def duties_for(employee, start: date, end: date, code: str = DUTY_CODE, session=None):
+    """
+    Возвращает смены сотрудника с указанным кодом в диапазоне дат [start, end].
+
+    Запрос идёт по индексу (employee_id, year, month) с построчным сравнением
+    (year, month, day) на границах диапазона.
+
+    :param employee: ФИО, id или объект Employee.
+    :param start: первая дата диапазона (включительно).
+    :param end: последняя дата диапазона (включительно).
+    :param code: код смены; None — все смены.
+    :param session: открытая сессия; если не передана, создаётся и закрывается своя.
+    :return: список Schedule в хронологическом порядке.
+    """
+    stmt = (
+        _with_employee(select(Schedule))
+        .where(_employee_filter(employee))
+        .where(tuple_(Schedule.year, Schedule.month, Schedule.day).between(
+            (start.year, start.month, start.day), (end.year, end.month, end.day)
+        ))
+        .order_by(Schedule.year, Schedule.month, Schedule.day)
+    )
+    if code is not None:
+        stmt = stmt.where(Schedule.shift == code)
+    return _fetch(stmt, session)
+
+
+def month_grid(year: int, month: int, session=None):
+    """
+    Возвращает расписание месяца из базы в том же виде, что и parse_schedule.
+
+    :return: кортеж (employees, schedules), где schedules — список
+             {"day": <число>, "shifts": {<сотрудник>: <код смены>, ...}};
+             (None, None), если за месяц нет записей.
+    """
+    stmt = (
+        _with_employee(select(Schedule))
+        .where(Schedule.year == year, Schedule.month == month)
+        .order_by(Schedule.day, Employee.id)
+    )
+    records = _fetch(stmt, session)
+    if not records:
+        return None, None
+
+    # Порядок сотрудников — порядок их добавления в базу (как столбцы первого импорта)
+    names_by_id = {record.employee_id: record.employee.name for record in records}
+    employees = [names_by_id[employee_id] for employee_id in sorted(names_by_id)]
+
+    schedules = []
+    current = None
+    for record in records:
+        name = record.employee.name
+        if current is None or current["day"] != record.day:
+            current = {"day": record.day, "shifts": {}}
+            schedules.append(current)
+        current["shifts"][name] = record.shift
+    return employees, schedules
+
+
+def shift_totals(start, end, employee=None, session=None, employees=None, team: str = None):
+    """
+    Сколько дней каждого кода смены у сотрудников за месяцы [start, end] по сводке shift_counts.
+
+    Читается по строке на сотрудника, месяц и код (индекс по первичному ключу),
+    а не все смены периода.
+
+    :param start: первый месяц (год, месяц) включительно.
+    :param end: последний месяц (год, месяц) включительно.
+    :param employee: ФИО, id или объект Employee; None — все сотрудники.
+    :param session: открытая сессия; если не передана, создаётся и закрывается своя.
+    :param employees: только эти ФИО (например, состав одной команды); None — без ограничения.
+    :param team: только сводка этой команды (team_key); None — сумма по всем командам.
+    :return: {ФИО: {код: число}} или для employee — {код: число}.
+    """
+    stmt = (
+        select(Employee.name, ShiftCount.shift, func.sum(ShiftCount.count))
+        .join(Employee, Employee.id == ShiftCount.employee_id)
+        .where(tuple_(ShiftCount.year, ShiftCount.month).between(tuple(start), tuple(end)))
+        .group_by(Employee.name, ShiftCount.shift)
+        .order_by(Employee.name, ShiftCount.shift)
+    )
+    if employee is not None:
+        stmt = stmt.where(_count_employee_filter(employee))
+    if employees is not None:
+        stmt = stmt.where(Employee.name.in_(list(employees)))
+    if team is not None:
+        stmt = stmt.where(ShiftCount.team == team)
+
+    if session is not None:
+        rows = session.execute(stmt).all()
+    else:
+        with Session() as own_session:
+            rows = own_session.execute(stmt).all()
+
+    totals = {}
+    for name, shift, count in rows:
+        totals.setdefault(name, {})[shift] = count
+    if employee is not None:
+        return next(iter(totals.values()), {})
+    return totals
+
+
+def shift_count_sources(team: str, start, end, session=None) -> dict:
+    """
+    Версии файлов, по которым менеджер команды пересчитал сводку месяцев [start, end]:
+    {(год, месяц): (mtime_ns, размер)}.
+    """
+    stmt = (
+        select(ShiftCountSource.year, ShiftCountSource.month, ShiftCountSource.file_mtime_ns,
+               ShiftCountSource.file_size)
+        .where(ShiftCountSource.team == team)
+        .where(tuple_(ShiftCountSource.year, ShiftCountSource.month).between(tuple(start), tuple(end)))
+    )
+    if session is not None:
+        rows = session.execute(stmt).all()
+    else:
+        with Session() as own_session:
+            rows = own_session.execute(stmt).all()
+    return {(year, month): (mtime_ns, size) for year, month, mtime_ns, size in rows}
+
+
+def _count_employee_filter(employee):
+    if isinstance(employee, Employee):
+        return ShiftCount.employee_id == employee.id
+    if isinstance(employee, int):
+        return ShiftCount.employee_id == employee
+    return Employee.name == employee
+
+
+def _with_employee(stmt):
+    # JOIN + contains_eager: сотрудник приходит в той же выборке, без отдельного запроса на запись
+    return stmt.join(Schedule.employee).options(contains_eager(Schedule.employee))
+
+
+def _employee_filter(employee):
+    if isinstance(employee, Employee):
+        return Schedule.employee_id == employee.id
+    if isinstance(employee, int):
+        return Schedule.employee_id == employee
+    return Employee.name == employee
+
+
+def _fetch(stmt, session):
+    if session is not None:
+        return session.scalars(stmt).all()
+    with Session() as own_session:
+        return own_session.scalars(stmt).all()
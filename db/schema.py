@@ -0,0 +1,40 @@
+# db/schema.py
+
+from sqlalchemy import inspect, text
+
+from .engine import engine
+from .models import Base, Schedule, ShiftCount
+
+
+def init_db(bind=engine):
+    """
+    Создаёт недостающие таблицы и индексы.
+
+    create_all не добавляет индексы в уже существующие таблицы, поэтому индексы
+    schedules создаются отдельно (IF NOT EXISTS). Перед созданием уникального
+    индекса из старой базы удаляются дубликаты, которые оставлял прежний импорт
+    (из каждой группы остаётся последняя запись).
+
+    Сводка shift_counts — производные данные. Таблица прежнего вида (без команды)
+    удаляется и создаётся заново; заполняют её импорт и менеджеры команд бота
+    (ScheduleManager.sync_rollup пересчитывает месяцы, которых в сводке нет).
+    """
+    inspector = inspect(bind)
+    if inspector.has_table(ShiftCount.__tablename__):
+        columns = {column["name"] for column in inspector.get_columns(ShiftCount.__tablename__)}
+        if "team" not in columns:
+            ShiftCount.__table__.drop(bind)
+    Base.metadata.create_all(bind)
+
+    existing = {index["name"] for index in inspect(bind).get_indexes(Schedule.__tablename__)}
+    with bind.begin() as conn:
+        for index in Schedule.__table__.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                conn.execute(text(
+                    "DELETE FROM schedules WHERE id NOT IN ("
+                    "SELECT MAX(id) FROM schedules GROUP BY year, month, day, employee_id)"
+                ))
+            index.create(conn, checkfirst=True)
+
@@ -1,3 +1,8 @@
 from .parser import *  
+from .stream_parser import parse_schedule_stream, parse_workbook_stream
+from .cache import ScheduleCache, schedule_cache, PARSER_BACKENDS
+from .store import ScheduleStore
 
-__all__ = ["parse_schedule,extract_period_from_filename,parse_schedule_from_directory"]
\ No newline at end of file
+__all__ = ["parse_schedule", "extract_period_from_filename", "parse_schedule_from_directory",
+           "parse_schedule_stream", "parse_workbook_stream",
+           "ScheduleCache", "schedule_cache", "PARSER_BACKENDS", "ScheduleStore"]
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import metrics
+from .parser import parse_schedule
+from .stream_parser import parse_schedule_stream
+
+# Доступные движки разбора Excel: pandas (полное чтение листа) и openpyxl (потоковое чтение)
+PARSER_BACKENDS = {
+    "pandas": parse_schedule,
+    "openpyxl": parse_schedule_stream,
+}
+
+
+class ScheduleCache:
+    """
+    Кэш разобранных Excel-файлов с расписанием.
+
+    Ключ записи — (путь, mtime, размер) файла: пока файл не меняется,
+    повторные запросы отдают уже разобранный результат без pd.read_excel.
+    Поиск файлов в каталоге — забота ScheduleStore.
+    """
+
+    def __init__(self, backend: str = "pandas"):
+        self._lock = threading.Lock()
+        self._parse = None
+        self.backend = None
+        # путь к файлу -> ((mtime, size), (employees, schedules))
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.set_backend(backend)
+
+    def set_backend(self, backend: str):
+        """
+        Выбирает движок разбора ("pandas" или "openpyxl"). Смена движка сбрасывает кэш,
+        так как результаты разных движков отличаются представлением пустых ячеек.
+        """
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"Неизвестный движок разбора Excel: {backend}")
+        if backend == self.backend:
+            return
+        with self._lock:
+            self.backend = backend
+            self._parse = PARSER_BACKENDS[backend]
+            self._entries.clear()
+
+    def load(self, file_path: str):
+        """
+        Возвращает (employees, schedules) для файла, разбирая его только если
+        файл новый или изменился с момента прошлого разбора.
+
+        :param file_path: путь к Excel-файлу.
+        :return: кортеж (employees, schedules), как у parse_schedule.
+        """
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                metrics.CACHE_HITS.inc()
+                return entry[1]
+            self.misses += 1
+        metrics.CACHE_MISSES.inc()
+        if entry is not None:
+            # Файл уже разбирался, но изменился на диске
+            metrics.CACHE_RELOADS.inc()
+
+        # Разбор идёт вне блокировки, чтобы не задерживать чтения других файлов
+        result = self._parse(file_path)
+        with self._lock:
+            self._entries[file_path] = (signature, result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики попаданий/промахов кэша.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Общий кэш процесса: им пользуются и обработчики бота, и ScheduleManager
+schedule_cache = ScheduleCache()
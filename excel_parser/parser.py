@@ -1,10 +1,16 @@
 import os
 import re
+import time
 from datetime import datetime
-from typing import Tuple
-import pandas as pd
+from typing import Tuple, TYPE_CHECKING
+import numpy as np
 import math
 
+import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 def parse_schedule(file_path: str):
     """
     Предположим:
@@ -15,88 +21,148 @@ def parse_schedule(file_path: str):
     4) Вертикально таблица заканчивается, когда в столбце с датами встретим пустую ячейку.
     """
 
+    # pandas импортируется лениво: потоковому парсеру (stream_parser) он не нужен
+    import pandas as pd
+
+    started = time.perf_counter()
     # 1. Считываем лист целиком, без заголовков
     raw_df = pd.read_excel(file_path, header=None)
+    result = parse_schedule_frame(raw_df)
+    metrics.record_parse("pandas", time.perf_counter() - started, result)
+    return result
+
+
+def parse_schedule_frame(raw_df: "pd.DataFrame"):
+    """
+    Разбирает уже считанный лист (DataFrame без заголовков) по правилам parse_schedule.
+
+    Все поиски выполняются масками NumPy, без построчного обхода iterrows/iat:
+    поиск ячейки "1" — argmax по булевой маске, конец строки с ФИО и конец
+    столбца с датами — argmax по маске "стоп", блок смен берётся одним срезом.
+    """
 
-    # 2. Ищем координаты ячейки со значением "1"
-    target_row, target_col = None, None
-    for i, row in raw_df.iterrows():
-        for j, val in enumerate(row):
-            if val == 1 or str(val).strip() == "1":
-                target_row, target_col = i, j
-                break
-        if target_row is not None:
-            break
-
-    if target_row is None:
+    # 2. Ищем координаты ячейки со значением "1" (первое совпадение при обходе по строкам)
+    anchor = _find_anchor(raw_df)
+    if anchor is None:
         print("Не нашли ячейку со значением '1'.")
         return None, None
+    target_row, target_col = anchor
 
     # 3. Смотрим, где у нас «ФИО сотрудников»:
     #    - они на строку выше (target_row - 1)
     #    - начинаются со столбца (target_col + 2)
     #    - тянутся вправо, пока ячейки не пустые
-    employees = []
     if target_row - 1 < 0:
         print("Нельзя взять строку выше — target_row - 1 < 0.")
         return None, None
 
-    row_above = raw_df.iloc[target_row - 1]  # строка выше
-    # Пробегаемся по столбцам, начиная с (target_col + 2), пока не встретим пустую ячейку
-    col_index = target_col + 2
-    while col_index < len(row_above):
-        val = row_above[col_index]
-        # Условие конца таблицы по горизонтали:
-        # как только ячейка None или пустая строка — выходим из цикла
-        if val is None or str(val).strip() == "":
-            break
-        employees.append(str(val).strip())
-        col_index += 1
+    # Строка берётся через iloc, как и раньше, чтобы типы значений совпадали
+    header = raw_df.iloc[target_row - 1].to_numpy()[target_col + 2:]
+    # Условие конца таблицы по горизонтали: ячейка None или пустая строка
+    header_stop = (header == None) | (_stripped_text(header)[0] == 0)  # noqa: E711
+    header_len = _first_true(header_stop)
+    employees = [str(val).strip() for val in header[:header_len]]
 
     if not employees:
         print("Не удалось определить сотрудников. Проверяйте структуру.")
         return None, None
 
-    # Теперь мы знаем, что столбцы с данными идут до col_index - 1 включительно.
-    # Следовательно, "интересующие" столбцы — это диапазон [target_col+2, col_index).
+    # Столбцы с данными — диапазон [target_col+2, col_index).
+    col_index = target_col + 2 + len(employees)
 
-    schedules = []
-    current_row = target_row
+    # 4. Столбец с датами (target_col) идёт вниз, пока значения числовые и не NaN.
+    day_values = raw_df.iloc[target_row:, target_col].to_numpy()
+    days_len = _first_true(~_day_mask(day_values))
+    if days_len == 0:
+        return employees, []
 
-    # 4. Идём вниз по столбцу с датами (target_col),
-    #    пока не встретим пустую/нечисловую ячейку.
-    while current_row < len(raw_df):
-        val_date = raw_df.iat[current_row, target_col]
+    # Блок смен целиком: строки с датами × столбцы сотрудников
+    block = raw_df.iloc[target_row:target_row + days_len, target_col + 2:col_index].to_numpy()
 
-        # Проверяем, что val_date — это число (int/float), не NaN
-        if isinstance(val_date, (int, float)) and not math.isnan(val_date):
-            day_of_month = int(val_date)  # предполагаем, что там целое (1,2,3...)
-            
-            # Получаем срез столбцов по количеству сотрудников
-            # Диапазон [target_col+2, col_index)
-            row_values = raw_df.iloc[current_row, target_col+2 : col_index]
-            # Превращаем в список, чтобы по индексам мапить к employees
-            row_values_list = row_values.tolist()
-
-            # Собираем словарь вида {"Иванов": "В", "Петров": "О", ...}
-            day_shifts = {}
-            for idx_emp, emp_name in enumerate(employees):
-                shift_val = row_values_list[idx_emp]
-                day_shifts[emp_name] = shift_val
-            
-            schedules.append({
-                "day": day_of_month,
-                "shifts": day_shifts
-            })
+    schedules = [
+        {"day": int(day_of_month), "shifts": dict(zip(employees, row_values))}
+        for day_of_month, row_values in zip(day_values[:days_len].tolist(), block.tolist())
+    ]
+    return employees, schedules
 
-            current_row += 1
 
-        else:
-            # Как только встретили нечисловое значение (пустую ячейку),
-            # считаем, что таблица по вертикали кончилась
-            break
+def _first_true(mask: np.ndarray) -> int:
+    """
+    Индекс первого True в одномерной маске или её длина, если True нет.
+    """
+    if mask.size == 0 or not mask.any():
+        return int(mask.size)
+    return int(mask.argmax())
 
-    return employees, schedules
+
+def _find_anchor(raw_df: "pd.DataFrame"):
+    """
+    Ищет первую (при обходе по строкам) ячейку, для которой val == 1 или str(val).strip() == "1".
+
+    Лист проверяется полосами строк: каждая полоса целиком сравнивается масками NumPy,
+    а поиск останавливается на первой полосе с совпадением. Полосы растут вдвое
+    (1, 2, 4, ... строк), поэтому если "1" стоит в первых строках листа (обычный случай),
+    остальной лист не просматривается.
+
+    :return: (строка, столбец) или None, если такой ячейки нет.
+    """
+    n_rows, n_cols = raw_df.shape
+    if n_cols == 0:
+        return None
+    start, size = 0, 1
+    while start < n_rows:
+        chunk = raw_df.iloc[start:start + size].to_numpy(dtype=object)
+        count, code = _stripped_text(chunk)
+        mask = (chunk == 1) | ((count == 1) & (code == ord("1")))
+        if mask.any():
+            row, col = divmod(int(mask.argmax()), n_cols)
+            return start + row, col
+        start += size
+        size *= 2
+    return None
+
+
+# Коды символов, которые str.strip() считает пробельными
+_WHITESPACE_CODES = np.array([code for code in range(0x3001) if chr(code).isspace()], dtype=np.uint32)
+
+
+def _stripped_text(values: np.ndarray):
+    """
+    Векторный аналог str(val).strip() для массива значений.
+
+    Значения приводятся к строкам одним astype(str), после чего массив символов
+    рассматривается как коды UCS-4. Возвращает для каждого значения число непробельных
+    символов и код последнего из них: str(val).strip() == "" — это count == 0,
+    str(val).strip() == "1" — это count == 1 и code == ord("1").
+    """
+    text = values.astype(str, order="C")
+    if text.dtype.itemsize == 0 or text.size == 0:
+        empty = np.zeros(values.shape, dtype=np.int64)
+        return empty, empty
+    codes = text.view(np.uint32).reshape(text.shape + (-1,))
+    significant = (codes != 0) & ~np.isin(codes, _WHITESPACE_CODES)
+    count = significant.sum(axis=-1)
+    code = np.where(significant, codes, 0).max(axis=-1)
+    return count, code
+
+
+# isinstance(val, (int, float)) and not isnan(val) для каждого элемента столбца с датами
+_is_day_value = np.frompyfunc(
+    lambda val: isinstance(val, (int, float)) and not math.isnan(val), 1, 1
+)
+
+
+def _day_mask(values: np.ndarray) -> np.ndarray:
+    """
+    Маска строк, в которых столбец с датами содержит число (int/float, не NaN).
+    """
+    if values.dtype.kind == "f":
+        return ~np.isnan(values)
+    if values.dtype == object:
+        return _is_day_value(values).astype(bool)
+    # Целочисленные numpy-скаляры (np.int64) не проходят isinstance(val, int),
+    # поэтому, как и при построчном разборе, такой столбец не считается столбцом дат.
+    return np.zeros(values.shape, dtype=bool)
 
 # Функция для извлечения месяца и года из имени файла.
 def extract_period_from_filename(filename: str) -> Tuple[int, int]:
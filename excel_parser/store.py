@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+
+from .cache import schedule_cache
+from .parser import extract_period_from_filename
+
+
+class ScheduleStore:
+    """
+    Хранилище расписаний всех месяцев из каталога с Excel-файлами.
+
+    Каталог индексируется по (год, месяц) с помощью extract_period_from_filename;
+    индекс перестраивается, только когда меняется mtime каталога. Каждый месяц
+    разбирается лениво — при первом обращении — и перечитывается, когда меняется
+    его файл. Проверки mtime (каталога и файлов) выполняются не чаще, чем раз
+    в check_interval секунд, так что частые запросы не делают системных вызовов.
+    """
+
+    def __init__(self, directory: str, cache=schedule_cache, check_interval: float = 2.0):
+        """
+        :param directory: каталог с файлами вида "[месяц]... [год].xlsx".
+        :param cache: кэш разобранных файлов (по умолчанию общий schedule_cache).
+        :param check_interval: как часто (в секундах) проверять изменения на диске.
+        """
+        self.directory = directory
+        self.cache = cache
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (год, месяц) -> путь к файлу
+        self._index = {}
+        self._dir_mtime = None
+        self._dir_checked_at = None
+        # (год, месяц) -> (время проверки, путь, (mtime, размер))
+        self._located = {}
+        # (год, месяц) -> ((mtime, размер), (employees, schedules))
+        self._parsed = {}
+
+    def periods(self):
+        """
+        Возвращает отсортированный список доступных периодов (год, месяц).
+        """
+        self._refresh_index()
+        with self._lock:
+            return sorted(self._index)
+
+    def path_for(self, year: int, month: int):
+        """
+        Путь к файлу расписания за месяц или None, если такого файла нет.
+        """
+        self._refresh_index()
+        with self._lock:
+            return self._index.get((year, month))
+
+    def load(self, year: int, month: int):
+        """
+        Возвращает отпечаток файла вместе с данными: ((mtime, размер), (employees, schedules))
+        или None, если файла за месяц нет. Файл разбирается, только если изменился.
+        """
+        located = self.locate(year, month)
+        if located is None:
+            return None
+        path, signature = located
+
+        key = (year, month)
+        parsed = self._parsed.get(key)
+        if parsed is None or parsed[0] != signature:
+            parsed = (signature, self.cache.load(path))
+            with self._lock:
+                self._parsed[key] = parsed
+        return parsed
+
+    def locate(self, year: int, month: int):
+        """
+        Путь и отпечаток файла месяца без разбора: (путь, (mtime, размер)) или None.
+        Результат проверки переиспользуется check_interval секунд.
+        """
+        key = (year, month)
+        now = time.monotonic()
+        # Чтение без блокировки: записи словаря только заменяются целиком
+        entry = self._located.get(key)
+        if entry is not None and now - entry[0] < self.check_interval:
+            return entry[1], entry[2]
+
+        path = self.path_for(year, month)
+        try:
+            stat = os.stat(path) if path is not None else None
+        except FileNotFoundError:
+            # Файл удалили между переиндексацией и чтением — считаем, что месяца нет
+            stat = None
+        if stat is None:
+            with self._lock:
+                self._located.pop(key, None)
+                self._parsed.pop(key, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self._located[key] = (now, path, signature)
+        return path, signature
+
+    def has_parsed(self, year: int, month: int) -> bool:
+        """
+        Хранит ли хранилище разобранные данные месяца (например, для оценки памяти).
+        """
+        return (year, month) in self._parsed
+
+    def _refresh_index(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._dir_checked_at is not None and now - self._dir_checked_at < self.check_interval:
+                return
+            self._dir_checked_at = now
+
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        with self._lock:
+            if dir_mtime == self._dir_mtime:
+                return
+
+        index = {}
+        for file in sorted(os.listdir(self.directory)):
+            if not file.lower().endswith('.xlsx'):
+                continue
+            try:
+                month, year = extract_period_from_filename(file)
+            except ValueError:
+                continue  # если формат не соответствует, пропускаем файл
+            # При нескольких файлах за один месяц берётся первый по имени
+            index.setdefault((year, month), os.path.join(self.directory, file))
+
+        with self._lock:
+            self._index = index
+            self._dir_mtime = dir_mtime
@@ -0,0 +1,124 @@
+import math
+import time
+
+import metrics
+
+
+def parse_schedule_stream(file_path: str, sheet_name: str = None):
+    """
+    Потоковый разбор листа с расписанием через openpyxl (read_only), без pandas.
+
+    Правила те же, что у parse_schedule:
+    1) Ячейка со значением "1" — это начало (по вертикали).
+    2) ФИО сотрудников — на строку выше, начиная на 2 столбца правее найденной "1".
+    3) Строка с ФИО заканчивается на первой пустой ячейке.
+    4) Таблица заканчивается на первой пустой/нечисловой ячейке в столбце с датами.
+
+    Строки читаются по одной, DataFrame не строится, а чтение листа прекращается,
+    как только заканчивается столбец с датами. Пустые ячейки смен — None (а не NaN).
+
+    :param file_path: путь к Excel-файлу.
+    :param sheet_name: имя листа; по умолчанию — активный лист, как у pd.read_excel.
+    :return: кортеж (employees, schedules) или (None, None).
+    """
+    started = time.perf_counter()
+    workbook = _open_workbook(file_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        result = _parse_rows(sheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    metrics.record_parse("openpyxl", time.perf_counter() - started, result)
+    return result
+
+
+def parse_workbook_stream(file_path: str):
+    """
+    Разбирает все листы книги за одно открытие файла.
+
+    :param file_path: путь к Excel-файлу.
+    :return: словарь {имя листа: (employees, schedules)}; для листов без таблицы — (None, None).
+    """
+    workbook = _open_workbook(file_path)
+    try:
+        return {
+            sheet.title: _parse_rows(sheet.iter_rows(values_only=True))
+            for sheet in workbook.worksheets
+        }
+    finally:
+        workbook.close()
+
+
+def _open_workbook(file_path: str):
+    # openpyxl импортируется только при использовании этого парсера
+    from openpyxl import load_workbook
+
+    return load_workbook(file_path, read_only=True, data_only=True)
+
+
+def _is_anchor(val) -> bool:
+    return val == 1 or str(val).strip() == "1"
+
+
+def _is_day(val) -> bool:
+    return isinstance(val, (int, float)) and not math.isnan(val)
+
+
+def _parse_rows(rows):
+    """
+    Разбирает поток строк листа (кортежи значений) в (employees, schedules).
+    """
+    rows = iter(rows)
+    # 1. Ищем первую ячейку со значением "1", запоминая предыдущую строку (в ней ФИО)
+    row_above = None
+    target_row, target_col = None, None
+    for row in rows:
+        for j, val in enumerate(row):
+            if val is not None and _is_anchor(val):
+                target_row, target_col = row, j
+                break
+        if target_row is not None:
+            break
+        row_above = row
+
+    if target_row is None:
+        print("Не нашли ячейку со значением '1'.")
+        return None, None
+
+    if row_above is None:
+        print("Нельзя взять строку выше — target_row - 1 < 0.")
+        return None, None
+
+    # 2. ФИО: со столбца target_col + 2 вправо до первой пустой ячейки
+    employees = []
+    for val in row_above[target_col + 2:]:
+        if val is None or str(val).strip() == "":
+            break
+        employees.append(str(val).strip())
+
+    if not employees:
+        print("Не удалось определить сотрудников. Проверяйте структуру.")
+        return None, None
+
+    first_col = target_col + 2
+    last_col = first_col + len(employees)
+
+    # 3. Идём вниз по столбцу с датами, начиная со строки с "1", и дочитываем лист
+    #    только до конца этого столбца.
+    schedules = []
+    row = target_row
+    while row is not None:
+        val_date = row[target_col] if target_col < len(row) else None
+        if not _is_day(val_date):
+            break
+
+        row_values = list(row[first_col:last_col])
+        # В режиме read_only хвостовые пустые ячейки строки могут отсутствовать
+        row_values.extend([None] * (len(employees) - len(row_values)))
+        schedules.append({
+            "day": int(val_date),
+            "shifts": dict(zip(employees, row_values)),
+        })
+        row = next(rows, None)
+
+    return employees, schedules
@@ -0,0 +1,412 @@
+# metrics.py
+"""
+Метрики процесса: счётчики и гистограммы в памяти, вывод в текстовом формате Prometheus.
+
+Запись метрики — это perf_counter, поиск корзины bisect и короткая блокировка,
+поэтому инструментирование можно не выключать. Наружу метрики отдаются
+по HTTP (MetricsServer или GET /metrics вебхук-сервера) и, по желанию,
+периодически пишутся в лог (start_log_dump).
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Registry:
+    """
+    Набор метрик, которые выводятся вместе.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Все метрики в текстовом формате Prometheus.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """
+        Краткая сводка для лога: значения счётчиков и (число, сумма) гистограмм.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        return {metric.name: metric.summary() for metric in metrics}
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """
+    Монотонный счётчик с необязательными метками.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def summary(self):
+        with self._lock:
+            if not self.labelnames:
+                return self._values.get((), 0)
+            return {"/".join(key): value for key, value in sorted(self._values.items())}
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами (как в Prometheus: le — верхняя граница).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики корзин (последняя — +Inf), сумма, число наблюдений]
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """
+        Контекстный менеджер: наблюдает длительность блока в секундах.
+        """
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield self.name + "_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+    def summary(self):
+        with self._lock:
+            return {"/".join(key) or "all": {"count": state[2], "sum": round(state[1], 6)}
+                    for key, state in sorted(self._values.items())}
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+# Разбор Excel
+PARSE_SECONDS = Histogram("schedule_parse_seconds", "Длительность разбора Excel-файла.", ("backend",))
+PARSE_ROWS = Counter("schedule_parse_rows_total", "Разобрано строк (дней) расписания.", ("backend",))
+
+# Кэш разобранных файлов
+CACHE_HITS = Counter("schedule_cache_hits_total", "Попадания в кэш разобранных файлов.")
+CACHE_MISSES = Counter("schedule_cache_misses_total", "Промахи кэша (файл разобран).")
+CACHE_RELOADS = Counter("schedule_cache_reloads_total", "Повторные разборы изменившихся файлов.")
+
+# Обработчики бота
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Длительность обработчиков бота.", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Исключения в обработчиках бота.", ("handler",))
+
+# Вызовы Telegram Bot API
+TELEGRAM_SECONDS = Histogram("telegram_api_seconds", "Длительность вызовов Telegram Bot API.", ("method",))
+TELEGRAM_ERRORS = Counter("telegram_api_errors_total", "Ошибки вызовов Telegram Bot API.", ("method", "error"))
+
+# Рассылка (bot.notifier.SendQueue): result = sent | retried | failed
+NOTIFY_MESSAGES = Counter("notify_messages_total", "Исходы отправки сообщений рассылки.", ("result",))
+
+# Запросы к базе
+DB_QUERIES = Counter("db_queries_total", "Выполненные SQL-запросы.", ("statement",))
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Длительность SQL-запросов.", ("statement",))
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL-запросы, завершившиеся ошибкой.", ("statement", "error"))
+
+# Методы API, вызовы которых оборачиваются instrument_bot
+TELEGRAM_METHODS = ("send_message", "delete_message", "answer_callback_query", "edit_message_reply_markup")
+
+
+def record_parse(backend: str, seconds: float, result):
+    """
+    Учитывает один разбор файла: длительность и число разобранных дней.
+    """
+    PARSE_SECONDS.observe(seconds, backend=backend)
+    schedules = result[1] if result else None
+    if schedules:
+        PARSE_ROWS.inc(len(schedules), backend=backend)
+
+
+def observe_handler(name: str):
+    """
+    Декоратор обработчика бота: длительность в bot_handler_seconds, исключения —
+    в bot_handler_errors_total. Поддерживает и обычные функции, и корутины.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    HANDLER_ERRORS.inc(handler=name)
+                    raise
+                finally:
+                    HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(handler=name)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+        return wrapper
+    return decorator
+
+
+def instrument_bot(bot, methods=TELEGRAM_METHODS):
+    """
+    Оборачивает методы API у объекта бота (TeleBot или AsyncTeleBot): длительность
+    каждого вызова пишется в telegram_api_seconds, ошибки — в telegram_api_errors_total
+    с кодом ошибки Telegram (или именем исключения, например при сетевой ошибке).
+    """
+    for method in methods:
+        original = getattr(bot, method)
+        setattr(bot, method, _instrument_call(method, original))
+    return bot
+
+
+def _instrument_call(method: str, func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                TELEGRAM_ERRORS.inc(method=method, error=_error_label(exc))
+                raise
+            finally:
+                TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=method)
+        return async_call
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            TELEGRAM_ERRORS.inc(method=method, error=_error_label(exc))
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=method)
+    return call
+
+
+def _error_label(exc: Exception) -> str:
+    # У ApiTelegramException есть error_code (например, 429 или 400)
+    code = getattr(exc, "error_code", None)
+    return str(code) if code is not None else type(exc).__name__
+
+
+def instrument_engine(engine):
+    """
+    Считает SQL-запросы движка SQLAlchemy по типу (SELECT, INSERT, ...) и их длительность;
+    запросы, завершившиеся ошибкой, — в db_query_errors_total.
+
+    Время начала хранится в контексте выполнения запроса, а не в соединении:
+    при ошибке оно пропадает вместе с контекстом и не копится в пуле соединений.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        kind = _statement_kind(statement)
+        DB_QUERIES.inc(statement=kind)
+        started = getattr(context, "_metrics_query_started", None)
+        if started is not None:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=kind)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        kind = _statement_kind(exception_context.statement)
+        DB_QUERIES.inc(statement=kind)
+        DB_QUERY_ERRORS.inc(statement=kind, error=type(exception_context.original_exception).__name__)
+        started = getattr(exception_context.execution_context, "_metrics_query_started", None)
+        if started is not None:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=kind)
+
+    return engine
+
+
+def _statement_kind(statement) -> str:
+    if not statement or not statement.strip():
+        return "OTHER"
+    return statement.lstrip().split(None, 1)[0].upper()
+
+
+def start_log_dump(interval: float, registry: Registry = REGISTRY):
+    """
+    Запускает фоновый поток, который раз в interval секунд пишет сводку метрик в лог.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            logger.info("Метрики: %s", registry.summary())
+
+    thread = threading.Thread(target=run, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+class MetricsServer:
+    """
+    Отдельный HTTP-сервер с метриками (для режима опроса, где вебхук-сервера нет).
+    GET на path возвращает registry.render().
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 9100, path: str = "/metrics",
+                 registry: Registry = REGISTRY):
+        self.path = path
+        self.registry = registry
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def start(self):
+        thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        logger.info("Метрики доступны на %s:%s%s", *self.address, self.path)
+        return thread
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != server.path:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = server.registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics: " + format, *args)
+
+        return Handler
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -1,3 +1,9 @@
 from .manager import ScheduleManager
+from .month import MonthSchedule
+from .matrix import ShiftMatrix
+from .registry import TeamRegistry
+from .roster import RosterState, generate_roster
+from .rollup import ShiftCountRollup
 
-__all__ = ["ScheduleManager"]
+__all__ = ["ScheduleManager", "MonthSchedule", "ShiftMatrix", "TeamRegistry", "RosterState", "generate_roster",
+           "ShiftCountRollup"]
@@ -0,0 +1,372 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class ShiftJournal:
+    """
+    Журнал изменений смен (append-only, по строке JSON на изменение).
+
+    ScheduleManager записывает сюда каждую замену и смену статуса до того, как применить
+    её в памяти. При загрузке месяца записи журнала накатываются поверх разобранного
+    Excel-файла, так что изменения переживают перезапуск и перечитывание файла.
+    Накатываются только записи, сделанные после последнего изменения файла:
+    если файл месяца загрузили заново, источником истины становится он.
+
+    Если передан writer (JournalWriter), записи дополнительно отправляются ему
+    для пакетной записи в таблицу schedules.
+
+    Ненужные записи удаляются compact(): журнал не растёт бесконечно ни на диске, ни в памяти.
+    """
+
+    def __init__(self, path: str, writer=None, fsync: bool = False):
+        """
+        :param path: путь к файлу журнала.
+        :param writer: фоновый писатель в базу (JournalWriter) или None.
+        :param fsync: вызывать os.fsync после каждой записи (надёжнее при сбое ОС, но медленнее).
+        """
+        self.path = path
+        self.writer = writer
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        # (год, месяц) -> список записей в порядке seq
+        self._by_month = {}
+        self._seq = 0
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+        if writer is not None:
+            writer.attach(self)
+
+    def record(self, year: int, month: int, changes):
+        """
+        Добавляет в журнал изменения одного месяца одной записью на диск.
+
+        :param changes: список кортежей (day, employee, shift, previous_shift).
+        :return: список добавленных записей.
+        """
+        entries = []
+        with self._lock:
+            now = time.time_ns()
+            for day, employee, shift, previous in changes:
+                self._seq += 1
+                entries.append({
+                    "seq": self._seq,
+                    "ts": now,
+                    "year": year,
+                    "month": month,
+                    "day": day,
+                    "employee": employee,
+                    "shift": _code(shift),
+                    "previous": _code(previous),
+                })
+            self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._by_month.setdefault((year, month), []).extend(entries)
+
+        if self.writer is not None:
+            try:
+                self.writer.submit(entries)
+            except RuntimeError:
+                # Записи уже на диске: изменение применяется, а в базу они попадут
+                # при следующем запуске (JournalWriter.attach дописывает недостающие)
+                logger.warning("Писатель журнала остановлен, %d записей будут записаны в базу позже", len(entries))
+        return entries
+
+    def entries_for(self, year: int, month: int, since_ns: int = None):
+        """
+        Записи журнала за месяц (в порядке добавления), сделанные не раньше since_ns.
+        """
+        with self._lock:
+            entries = list(self._by_month.get((year, month), ()))
+        if since_ns is None:
+            return entries
+        return [entry for entry in entries if entry["ts"] >= since_ns]
+
+    def entries_after(self, seq: int):
+        """
+        Все записи с номером больше seq (для дозаписи в базу после перезапуска).
+        """
+        with self._lock:
+            entries = [entry for month_entries in self._by_month.values() for entry in month_entries
+                       if entry["seq"] > seq]
+        entries.sort(key=lambda entry: entry["seq"])
+        return entries
+
+    def months(self):
+        """
+        Месяцы (год, месяц), за которые в журнале есть записи.
+        """
+        with self._lock:
+            return list(self._by_month)
+
+    def compact(self, horizons) -> int:
+        """
+        Удаляет записи, которые больше не нужны ни базе, ни загрузке месяцев, и переписывает файл.
+
+        Запись нужна, пока она не записана в базу (номер больше JournalWriter.flushed_seq)
+        или пока она новее последнего изменения файла месяца (её ещё накатывают поверх файла).
+        Удаляются только записи, для которых не выполнено ни то, ни другое.
+
+        :param horizons: {(год, месяц): mtime_ns файла месяца}; месяцы без файла не трогаются.
+        :return: число удалённых записей.
+        """
+        flushed_seq = self.writer.flushed_seq if self.writer is not None else None
+        with self._lock:
+            kept = {}
+            removed = 0
+            for key, entries in self._by_month.items():
+                horizon = horizons.get(key)
+                keep = [
+                    entry for entry in entries
+                    if horizon is None or entry["ts"] >= horizon
+                    or (flushed_seq is not None and entry["seq"] > flushed_seq)
+                ]
+                removed += len(entries) - len(keep)
+                if keep:
+                    kept[key] = keep
+            if not removed:
+                return 0
+
+            # Первая строка хранит последний номер: нумерация продолжается и после удаления всех записей
+            # (по номерам писатель в базу понимает, что уже записано)
+            lines = [json.dumps({"seq": self._seq, "compacted": True}) + "\n"]
+            for entry in sorted((entry for entries in kept.values() for entry in entries),
+                                key=lambda entry: entry["seq"]):
+                lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._by_month = kept
+        logger.info("Журнал смен сжат: удалено %d записей", removed)
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная последняя строка после сбоя — пропускаем
+                    logger.warning("Пропущена повреждённая запись журнала: %r", line)
+                    continue
+                if entry.get("compacted"):
+                    self._seq = max(self._seq, entry["seq"])
+                    continue
+                self._by_month.setdefault((entry["year"], entry["month"]), []).append(entry)
+                self._seq = max(self._seq, entry["seq"])
+
+
+class JournalWriter:
+    """
+    Фоновый писатель журнала в таблицу schedules.
+
+    Записи копятся в очереди и сбрасываются пакетом в одной транзакции, когда набирается
+    batch_size записей или с момента первой ожидающей записи прошло flush_interval секунд.
+    Номер последней записанной записи хранится рядом с журналом (<журнал>.flushed),
+    поэтому после перезапуска дописываются только недостающие записи.
+    Статистика (размеры пакетов, задержка сброса) доступна через stats().
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._condition = threading.Condition()
+        # Сериализует запись пакетов: пакеты попадают в базу строго в порядке очереди
+        self._write_lock = threading.Lock()
+        self._db_ready = False
+        self._queue = deque()
+        self._thread = None
+        self._stopped = False
+        self._journal = None
+        self._flushed_seq = 0
+        self._stats = {
+            "batches": 0,
+            "flushed": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_seconds": 0.0,
+            "max_delay_seconds": 0.0,
+        }
+
+    def attach(self, journal: ShiftJournal):
+        """
+        Привязывает писатель к журналу и ставит в очередь записи, не попавшие в базу.
+        """
+        self._journal = journal
+        self._flushed_seq = self._read_flushed_seq()
+        pending = journal.entries_after(self._flushed_seq)
+        if pending:
+            self.submit(pending)
+
+    def submit(self, entries):
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Писатель журнала остановлен.")
+            now = time.monotonic()
+            self._queue.extend((now, entry) for entry in entries)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """
+        Синхронно записывает всё, что накопилось в очереди (до первой ошибки записи).
+        """
+        while self._flush_batch():
+            pass
+
+    def stop(self):
+        """
+        Останавливает фоновый поток и записывает оставшуюся очередь.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    @property
+    def flushed_seq(self) -> int:
+        """
+        Номер последней записи журнала, записанной в базу.
+        """
+        return self._flushed_seq
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._queue)
+        return stats
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    if len(self._queue) >= self.batch_size:
+                        break
+                    timeout = self._queue[0][0] + self.flush_interval - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            if not self._flush_batch():
+                # Ошибка записи: пакет возвращён в очередь, повторяем не сразу
+                time.sleep(self.flush_interval)
+
+    def _flush_batch(self) -> bool:
+        """
+        Записывает один пакет из очереди. Возвращает True, если пакет записан.
+        """
+        with self._write_lock:
+            with self._condition:
+                batch = self._take_batch()
+            if not batch:
+                return False
+            return self._write(batch)
+
+    def _take_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _write(self, batch) -> bool:
+        # Импорт здесь: модель БД нужна только при включённой записи журнала
+        from db import Session, init_db, resolve_employee_ids, upsert_schedules, delete_schedules
+
+        started = time.monotonic()
+        entries = [entry for _, entry in batch]
+        try:
+            if not self._db_ready:
+                init_db()
+                self._db_ready = True
+            with Session() as session, session.begin():
+                employee_ids = resolve_employee_ids(session, [entry["employee"] for entry in entries])
+                # Внутри пакета побеждает последняя запись для ячейки
+                latest = {}
+                for entry in entries:
+                    key = (entry["year"], entry["month"], entry["day"], employee_ids[entry["employee"]])
+                    latest[key] = entry["shift"]
+                upserts, deletes = [], []
+                for (year, month, day, employee_id), shift in latest.items():
+                    row = {"year": year, "month": month, "day": day, "employee_id": employee_id}
+                    if shift is None:
+                        deletes.append(row)
+                    else:
+                        upserts.append(dict(row, shift=shift))
+                upsert_schedules(session, upserts)
+                delete_schedules(session, deletes)
+        except Exception:
+            logger.exception("Не удалось записать пакет журнала (%d записей), повтор позже", len(entries))
+            with self._condition:
+                self._stats["errors"] += 1
+                self._queue.extendleft(reversed(batch))
+            return False
+
+        finished = time.monotonic()
+        self._flushed_seq = max(self._flushed_seq, max(entry["seq"] for entry in entries))
+        self._write_flushed_seq()
+        with self._condition:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["flushed"] += len(entries)
+            stats["last_batch_size"] = len(entries)
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(entries))
+            stats["last_flush_seconds"] = finished - started
+            stats["max_delay_seconds"] = max(stats["max_delay_seconds"], finished - batch[0][0])
+        return True
+
+    def _flushed_path(self):
+        return self._journal.path + ".flushed" if self._journal is not None else None
+
+    def _read_flushed_seq(self) -> int:
+        path = self._flushed_path()
+        if path is None or not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as f:
+            content = f.read().strip()
+        return int(content) if content else 0
+
+    def _write_flushed_seq(self):
+        path = self._flushed_path()
+        if path is None:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(self._flushed_seq))
+        os.replace(tmp_path, path)
+
+
+def _code(shift):
+    # В журнал пишутся только коды-строки; пустая ячейка (NaN/None) — null
+    return shift if isinstance(shift, str) else None
@@ -1,54 +1,306 @@
-# Импортируем функцию parse_schedule из вашего модуля парсера Excel.
-from excel_parser import parse_schedule_from_directory
+import logging
+import threading
+from datetime import datetime
+
+# Расписания всех месяцев берём из общего хранилища поверх кэша парсера Excel.
+from excel_parser.store import ScheduleStore
+
+from .matrix import SHIFT_CODES, ShiftMatrix
+from .month import MonthSchedule, DUTY_CODE
+from .roster import DEFAULT_MIN_REST, RosterState, generate_roster
+from .snapshot import read_snapshot, write_snapshot, snapshot_path
+
+logger = logging.getLogger(__name__)
+
+# Примерная память на ячейку в результате разбора файла ({"day", "shifts": {...}}),
+# который хранят кэш и хранилище рядом с матрицей: слот словаря, ключ и значение.
+PARSED_CELL_BYTES = 100
 
 class ScheduleManager:
     # Допустимые коды смен.
     # Р – например, рабочий день (рабочий), В – выходной, К – конкурс, О – отпуск, Д – дежурство.
     # Здесь "Д" означает именно дежурство.
-    ALLOWED_CODES = {"Р", "В", "К", "О", "Д"}
+    ALLOWED_CODES = set(SHIFT_CODES)
+    DUTY_CODE = DUTY_CODE
+    # Ограничения графика дежурств для проверки изменений (validate=True) — см. schedule.roster
+    MIN_REST = DEFAULT_MIN_REST
+    DUTY_PER_DAY = None
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, store: ScheduleStore = None, journal=None, snapshots: bool = True,
+                 rollup=None):
         """
         Конструктор класса ScheduleManager.
         
-        При инициализации происходит вызов функции parse_schedule для загрузки расписания
-        из Excel-файла. Если данные успешно загружены, они сохраняются в атрибутах:
-          - self.employees: список сотрудников (ФИО);
-          - self.schedules: список записей расписания, где каждая запись имеет вид:
-            {"day": <число>, "shifts": {<сотрудник>: <код смены>, ...}}.
+        Менеджер работает с расписаниями любых месяцев из каталога file_path.
+        Файлы индексируются хранилищем ScheduleStore по (год, месяц), каждый месяц
+        загружается при первом обращении и перезагружается, если его файл изменился.
+        Для каждого месяца хранится MonthSchedule поверх компактной матрицы смен (ShiftMatrix).
+        
+        Во всех методах year и month необязательны: по умолчанию берётся текущий месяц.
+        
+        :param file_path: строка с путем к каталогу с Excel-файлами.
+        Если передан журнал (ShiftJournal), замены и смены статуса записываются в него
+        до применения в памяти, а при загрузке месяца его записи накатываются поверх файла.
+        
+        :param store: готовое хранилище (по умолчанию создаётся для file_path).
+        :param journal: журнал изменений смен или None (изменения только в памяти).
+        :param snapshots: использовать скомпилированные снимки "<файл>.xlsx.snap" (schedule.snapshot).
+        :param rollup: сводка shift_counts команды в базе (ShiftCountRollup) или None. Менеджер
+                       пересчитывает её при (пере)загрузке месяца и меняет при каждом изменении смен.
         
-        :param file_path: строка с путем к Excel-файлу.
+        Если рядом с файлом лежит снимок, построенный из той же версии файла (mtime и размер),
+        месяц загружается из него за миллисекунды, без pandas/openpyxl. Иначе файл разбирается,
+        а снимок перекомпилируется.
+        
+        Потокобезопасность: MonthSchedule — неизменяемый снимок. Читатели получают
+        текущий снимок без блокировок; замены, смены статуса и (пере)загрузка месяца
+        выполняются под одной блокировкой, строят новый снимок (copy-on-write)
+        и публикуют его одним присваиванием в self._months.
+        """
+        self.file_path = file_path
+        self.store = store if store is not None else ScheduleStore(file_path)
+        self.journal = journal
+        self.snapshots = snapshots
+        self.rollup = rollup
+        # Месяцы, сводку которых не удалось записать в базу: их пересчитает sync_rollup
+        self._stale_rollups = set()
+        # (год, месяц) -> (отпечаток файла, MonthSchedule); записи только заменяются целиком
+        self._months = {}
+        # Сериализует писателей; реентерабельная, т.к. писатель вызывает get_month
+        self._write_lock = threading.RLock()
+        # (год, месяц) -> (MonthSchedule, (MIN_REST, DUTY_PER_DAY), RosterState) для проверки изменений;
+        # состояние строится один раз на снимок и переносится на следующий снимок в _publish
+        self._roster_states = {}
+
+    @property
+    def employees(self):
+        """
+        Список сотрудников текущего месяца (или None, если расписания нет).
+        """
+        month_schedule = self.get_month()
+        return month_schedule.employees if month_schedule is not None else None
+
+    @property
+    def schedules(self):
         """
-        employees, schedules = parse_schedule_from_directory(file_path)
-        # if not employees or not schedules:
-        #     raise ValueError("Не удалось получить расписание из файла!")
+        Записи расписания текущего месяца (или None, если расписания нет).
+        """
+        month_schedule = self.get_month()
+        return month_schedule.schedules if month_schedule is not None else None
+
+    def get_month(self, year: int = None, month: int = None):
+        """
+        Возвращает снимок MonthSchedule за месяц, загружая его при первом обращении
+        и перезагружая при изменении файла.
         
-        self.employees = employees
-        self.schedules = schedules
+        Снимок не меняется: чтобы несколько запросов видели одну и ту же версию
+        расписания, берите снимок один раз и обращайтесь к его методам.
+        
+        :return: MonthSchedule или None, если файла за этот месяц нет.
+        """
+        year, month = self._period(year, month)
+        key = (year, month)
+
+        # Только путь и отпечаток файла: сам файл разбирается, лишь если снимок не подошёл
+        located = self.store.locate(year, month)
+        if located is None:
+            # Под блокировкой: писатель между get_month и _publish рассчитывает, что месяц на месте
+            with self._write_lock:
+                self._months.pop(key, None)
+                self._roster_states.pop(key, None)
+            return None
+        path, version = located
 
-    def get_full_schedule(self):
+        # Быстрый путь без блокировки: опубликованный снимок актуальной версии файла
+        entry = self._months.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        with self._write_lock:
+            # Пока ждали блокировку, месяц мог загрузить другой поток
+            entry = self._months.get(key)
+            if entry is None or entry[0] != version:
+                loaded = self._load_matrix(year, month, path, version)
+                if loaded is None:
+                    return None
+                version, matrix = loaded
+                month_schedule = MonthSchedule(year, month, None, None, matrix=matrix)
+                month_schedule = self._replay_journal(month_schedule, version)
+                entry = (version, month_schedule)
+                self._months[key] = entry
+                self._replace_rollup(month_schedule, version)
+        return entry[1]
+
+    def _load_matrix(self, year: int, month: int, path: str, version):
+        """
+        Матрица смен месяца: из актуального снимка или разбором файла (с перекомпиляцией снимка).
+
+        :return: (отпечаток файла, ShiftMatrix) или None, если таблица в файле не найдена.
+        """
+        if self.snapshots:
+            matrix = read_snapshot(snapshot_path(path), version)
+            if matrix is not None:
+                return version, matrix
+
+        loaded = self.store.load(year, month)
+        if loaded is None:
+            return None
+        version, (employees, schedules) = loaded
+        if employees is None or schedules is None:
+            return None
+        matrix = ShiftMatrix.from_records(employees, schedules)
+
+        if self.snapshots:
+            try:
+                write_snapshot(snapshot_path(path), matrix, version)
+            except OSError:
+                # Например, каталог только для чтения: работаем без снимка
+                logger.warning("Не удалось записать снимок расписания для %s", path, exc_info=True)
+        return version, matrix
+
+    def _replay_journal(self, month_schedule: MonthSchedule, version) -> MonthSchedule:
+        """
+        Накатывает на только что загруженный месяц изменения из журнала,
+        сделанные после последнего изменения файла (version[0] — mtime в наносекундах).
+        
+        :return: новый снимок с изменениями из журнала.
+        """
+        if self.journal is None:
+            return month_schedule
+        changes = []
+        for entry in self.journal.entries_for(month_schedule.year, month_schedule.month, since_ns=version[0]):
+            day_schedule = month_schedule.day(entry["day"])
+            # Запись о дне или сотруднике, которых больше нет в файле, пропускаем
+            if day_schedule is None or entry["employee"] not in day_schedule:
+                continue
+            changes.append((entry["day"], entry["employee"], entry["shift"]))
+        return month_schedule.with_changes(changes)
+
+    def attach_journal(self, journal):
+        """
+        Подключает журнал смен. Загруженные месяцы сбрасываются, чтобы при следующем
+        обращении на них накатились записи журнала.
+        """
+        with self._write_lock:
+            self.journal = journal
+            self._months = {}
+            self._roster_states = {}
+
+    def compact_journal(self) -> int:
+        """
+        Удаляет из журнала записи, уже записанные в базу и сделанные до последнего
+        изменения файла своего месяца (см. ShiftJournal.compact).
+
+        :return: число удалённых записей.
+        """
+        if self.journal is None:
+            return 0
+        horizons = {}
+        for year, month in self.journal.months():
+            located = self.store.locate(year, month)
+            if located is not None:
+                horizons[(year, month)] = located[1][0]
+        return self.journal.compact(horizons)
+
+    def memory_usage(self) -> int:
+        """
+        Примерная память загруженных месяцев в байтах: матрицы смен
+        и разобранные данные файлов, которые держат хранилище и кэш.
+        """
+        total = 0
+        for _, month_schedule in list(self._months.values()):
+            matrix = month_schedule.matrix
+            total += matrix.nbytes
+            if self.store.has_parsed(month_schedule.year, month_schedule.month):
+                total += matrix.data.size * PARSED_CELL_BYTES
+        return total
+
+    def available_periods(self):
+        """
+        Список (год, месяц), для которых в каталоге есть файлы расписания.
+        """
+        return self.store.periods()
+
+    def get_full_schedule(self, year: int = None, month: int = None):
         """
         Возвращает полное расписание.
         
-        :return: список всех записей расписания.
+        :return: кортеж всех записей расписания (или None, если месяца нет).
         """
-        return self.schedules
+        month_schedule = self.get_month(year, month)
+        return month_schedule.schedules if month_schedule is not None else None
 
-    def get_day_schedule(self, day: int):
+    def get_day_schedule(self, day: int, year: int = None, month: int = None):
         """
         Возвращает расписание для конкретного дня.
         
-        Проходим по списку записей расписания (self.schedules) и ищем запись, где ключ "day" равен переданному дню.
+        Запись — представление строки матрицы смен, день находится за O(1).
         
         :param day: число дня (например, 1, 2, 3, ...).
-        :return: словарь соответствия сотрудник → код смены или None, если запись для данного дня не найдена.
+        :return: словарь (только чтение) соответствия сотрудник → код смены или None, если запись для данного дня не найдена.
+        """
+        month_schedule = self.get_month(year, month)
+        return month_schedule.day(day) if month_schedule is not None else None
+
+    def get_on_duty(self, day: int, year: int = None, month: int = None):
         """
-        for record in self.schedules:
-            if record["day"] == day:
-                return record["shifts"]
-        return None
+        Возвращает дежурных (код "Д") на указанный день в порядке столбцов таблицы.
+        
+        :param day: число дня.
+        :return: кортеж ФИО или None, если расписания на этот день нет.
+        """
+        month_schedule = self.get_month(year, month)
+        return month_schedule.on_duty(day) if month_schedule is not None else None
 
-    def swap_shifts(self, day1: int, day2: int, user1: str, user2: str) -> bool:
+    def get_employee_days(self, employee: str, code: str = DUTY_CODE, year: int = None, month: int = None):
+        """
+        Возвращает дни, в которые у сотрудника стоит указанный код смены (по умолчанию — дежурства).
+        
+        :param employee: ФИО сотрудника.
+        :param code: код смены из ALLOWED_CODES.
+        :return: кортеж дней по возрастанию (пустой, если таких дней нет).
+        """
+        month_schedule = self.get_month(year, month)
+        return month_schedule.employee_days(employee, code) if month_schedule is not None else ()
+
+    def get_employee_counts(self, code: str = DUTY_CODE, year: int = None, month: int = None):
+        """
+        Возвращает, сколько дней с указанным кодом смены (по умолчанию — дежурств) у каждого сотрудника.
+        
+        :return: словарь ФИО → число дней (пустой, если месяца нет).
+        """
+        month_schedule = self.get_month(year, month)
+        return month_schedule.counts(code) if month_schedule is not None else {}
+
+    def sync_rollup(self, start, end):
+        """
+        Сверяет сводку shift_counts команды с файлами месяцев [start, end] (включительно, (год, месяц)).
+
+        Месяц пересчитывается, если его сводка посчитана по другой версии файла (файл заменили,
+        месяц перезаписал импорт) или её не удалось записать. Такой месяц загружается (перезагрузка
+        сама пересчитывает сводку); месяцы, чья сводка актуальна, не загружаются и не разбираются.
+        """
+        if self.rollup is None:
+            return
+        periods = [tuple(period) for period in self.available_periods() if start <= tuple(period) <= end]
+        if not periods:
+            return
+        stored = self.rollup.versions(start, end)
+        for year, month in periods:
+            key = (year, month)
+            located = self.store.locate(year, month)
+            if located is None or (stored.get(key) == located[1] and key not in self._stale_rollups):
+                continue
+            with self._write_lock:
+                before = self._months.get(key)
+                month_schedule = self.get_month(year, month)
+                entry = self._months.get(key)
+                # Если get_month не перезагрузил месяц, сводку пересчитываем по уже загруженному снимку
+                if month_schedule is not None and entry is before:
+                    self._replace_rollup(month_schedule, entry[0])
+
+    def swap_shifts(self, day1: int, day2: int, user1: str, user2: str,
+                    year: int = None, month: int = None, validate: bool = False) -> bool:
         """
         Меняет местами дежурства двух сотрудников, которые дежурят на разных днях.
         
@@ -66,25 +318,36 @@ class ScheduleManager:
         :param day2: День, на котором исходно дежурит user2.
         :param user1: Имя первого сотрудника.
         :param user2: Имя второго сотрудника.
+        :param validate: не выполнять обмен, если он нарушает ограничения графика дежурств (см. check_changes).
         :return: True, если обмен выполнен успешно, иначе False.
         """
-        # Получаем расписание для первого и второго дня.
-        day1_schedule = self.get_day_schedule(day1)
-        day2_schedule = self.get_day_schedule(day2)
-        
-        # Если расписание хотя бы для одного из дней не найдено, обмен невозможен.
-        if day1_schedule is None or day2_schedule is None:
-            return False
-        
-        # Проверяем, что в расписаниях присутствуют указанные сотрудники.
-        if user1 not in day1_schedule or user2 not in day2_schedule:
-            return False
-        
-        # Меняем местами коды смен:
-        day1_schedule[user1], day2_schedule[user2] = day2_schedule[user2], day1_schedule[user1]
-        return True
+        with self._write_lock:
+            month_schedule = self.get_month(year, month)
+            if month_schedule is None:
+                return False
+
+            # Получаем расписание для первого и второго дня.
+            day1_schedule = month_schedule.day(day1)
+            day2_schedule = month_schedule.day(day2)
+            
+            # Если расписание хотя бы для одного из дней не найдено, обмен невозможен.
+            if day1_schedule is None or day2_schedule is None:
+                return False
+            
+            # Проверяем, что в расписаниях присутствуют указанные сотрудники.
+            if user1 not in day1_schedule or user2 not in day2_schedule:
+                return False
+            
+            # Меняем местами коды смен: новый снимок копирует только два затронутых дня.
+            shift1, shift2 = day1_schedule[user1], day2_schedule[user2]
+            if validate and self._violations(month_schedule, [(day1, user1, shift2), (day2, user2, shift1)]):
+                return False
+            self._record(month_schedule, [(day1, user1, shift2, shift1), (day2, user2, shift1, shift2)])
+            self._publish(month_schedule, [(day1, user1, shift2), (day2, user2, shift1)])
+            return True
 
-    def change_status(self, day: int, user: str, new_status: str) -> bool:
+    def change_status(self, day: int, user: str, new_status: str,
+                      year: int = None, month: int = None, validate: bool = False) -> bool:
         """
         Позволяет сотруднику изменить статус своей смены на выбранный.
         
@@ -100,21 +363,166 @@ class ScheduleManager:
         :param day: Число дня, для которого производится изменение статуса.
         :param user: Имя сотрудника, чей статус изменяется.
         :param new_status: Новый код смены (например, "Р", "В", "К", "О" или "Д").
+        :param validate: не менять статус, если это нарушает ограничения графика дежурств (см. check_changes).
         :return: True, если изменение выполнено успешно, иначе False.
         """
         # Проверяем, что новый статус входит в набор допустимых кодов.
         if new_status not in self.ALLOWED_CODES:
             return False
         
-        # Получаем расписание для указанного дня.
-        day_schedule = self.get_day_schedule(day)
-        if day_schedule is None:
-            return False
-        
-        # Проверяем, что указанный сотрудник присутствует в расписании этого дня.
-        if user not in day_schedule:
-            return False
-        
-        # Обновляем статус смены для сотрудника.
-        day_schedule[user] = new_status
-        return True
+        with self._write_lock:
+            # Получаем расписание для указанного дня.
+            month_schedule = self.get_month(year, month)
+            day_schedule = month_schedule.day(day) if month_schedule is not None else None
+            if day_schedule is None:
+                return False
+            
+            # Проверяем, что указанный сотрудник присутствует в расписании этого дня.
+            if user not in day_schedule:
+                return False
+            
+            if validate and self._violations(month_schedule, [(day, user, new_status)]):
+                return False
+
+            # Обновляем статус смены для сотрудника (новый снимок матрицы).
+            self._record(month_schedule, [(day, user, new_status, day_schedule[user])])
+            self._publish(month_schedule, [(day, user, new_status)])
+            return True
+
+    def check_changes(self, changes, year: int = None, month: int = None):
+        """
+        Проверяет предлагаемые изменения [(день, ФИО, новый код), ...] на ограничения
+        графика дежурств (MIN_REST, DUTY_PER_DAY, коды "О"/"К"/"В"), не применяя их.
+
+        Например, обмен swap_shifts(day1, day2, user1, user2) — это изменения
+        [(day1, user1, смена user2 на day2), (day2, user2, смена user1 на day1)].
+
+        :return: список нарушений (см. RosterState.check) или None, если месяца нет.
+        """
+        with self._write_lock:
+            month_schedule = self.get_month(year, month)
+            if month_schedule is None:
+                return None
+            return self._violations(month_schedule, changes)
+
+    def generate_roster(self, duty_per_day=1, min_rest: int = None, history=None, seed=None,
+                        apply: bool = False, year: int = None, month: int = None):
+        """
+        Составляет график дежурств месяца: дозаполняет "Д" до duty_per_day в день,
+        не трогая "О", "К", "В" и соблюдая отдых между дежурствами (см. schedule.roster).
+
+        :param min_rest: минимум свободных дней между дежурствами (по умолчанию MIN_REST).
+        :param history: {ФИО: число дежурств до этого месяца} для равномерного распределения.
+        :param apply: записать новые дежурства в расписание (через журнал, как change_status).
+        :return: результат generate_roster ("schedules", "assigned", "unfilled", "counts")
+                 или None, если месяца нет.
+        """
+        min_rest = self.MIN_REST if min_rest is None else min_rest
+        with self._write_lock:
+            month_schedule = self.get_month(year, month)
+            if month_schedule is None:
+                return None
+            result = generate_roster(month_schedule.matrix, duty_per_day=duty_per_day, min_rest=min_rest,
+                                     history=history, seed=seed)
+            if apply and result["assigned"]:
+                matrix = month_schedule.matrix
+                self._record(month_schedule, [(day, employee, DUTY_CODE, matrix.shift(day, employee))
+                                              for day, employee in result["assigned"]])
+                self._publish(month_schedule, [(day, employee, DUTY_CODE)
+                                               for day, employee in result["assigned"]])
+            return result
+
+    def _violations(self, month_schedule: MonthSchedule, changes):
+        """
+        Нарушения ограничений графика дежурств (см. RosterState.check). Вызывается только под self._write_lock.
+
+        RosterState строится по матрице за O(дни × сотрудники) только при первой проверке снимка
+        (или после перезагрузки месяца и смены MIN_REST/DUTY_PER_DAY); дальше _publish переносит его
+        на новый снимок, и проверка стоит O(log n) на изменение.
+        """
+        key = (month_schedule.year, month_schedule.month)
+        duty_per_day = self.DUTY_PER_DAY
+        params = (self.MIN_REST, dict(duty_per_day) if isinstance(duty_per_day, dict) else duty_per_day)
+        cached = self._roster_states.get(key)
+        if cached is not None and cached[0] is month_schedule and cached[1] == params:
+            state = cached[2]
+        else:
+            state = RosterState(month_schedule.matrix, min_rest=self.MIN_REST, duty_per_day=duty_per_day)
+            self._roster_states[key] = (month_schedule, params, state)
+        return state.check(changes)
+
+    def _record(self, month_schedule: MonthSchedule, changes):
+        # Журнал пишется до изменения в памяти: если запись не удалась, изменения не будет
+        if self.journal is not None:
+            self.journal.record(month_schedule.year, month_schedule.month, changes)
+
+    def _publish(self, month_schedule: MonthSchedule, changes):
+        """
+        Строит новый снимок месяца и публикует его вместо month_schedule.
+        Вызывается только под self._write_lock.
+
+        :raises RuntimeError: месяц уже выгружен (его файл удалён).
+        """
+        key = (month_schedule.year, month_schedule.month)
+        entry = self._months.get(key)
+        if entry is None:
+            raise RuntimeError(f"Месяц {month_schedule.month:02d}.{month_schedule.year} не загружен.")
+        version = entry[0]
+        published = month_schedule.with_changes(changes)
+        self._months[key] = (version, published)
+        self._apply_rollup(month_schedule, published, changes)
+
+        cached = self._roster_states.pop(key, None)
+        if cached is not None and cached[0] is month_schedule:
+            _, params, state = cached
+            for day, employee, code in changes:
+                state.set(day, employee, code)
+            state.rebase(published.matrix)
+            self._roster_states[key] = (published, params, state)
+
+    def _replace_rollup(self, month_schedule: MonthSchedule, version):
+        """
+        Пересчитывает сводку месяца в базе. Вызывается только под self._write_lock.
+        """
+        if self.rollup is None:
+            return
+        key = (month_schedule.year, month_schedule.month)
+        try:
+            self.rollup.replace_month(month_schedule, version)
+        except Exception:
+            logger.exception("Не удалось пересчитать сводку смен за %02d.%d", month_schedule.month, month_schedule.year)
+            self._stale_rollups.add(key)
+        else:
+            self._stale_rollups.discard(key)
+
+    def _apply_rollup(self, month_schedule: MonthSchedule, published: MonthSchedule, changes):
+        """
+        Переносит изменения смен в сводку месяца: прежний код ячейки −1, новый +1.
+        Вызывается только под self._write_lock.
+        """
+        key = (month_schedule.year, month_schedule.month)
+        if self.rollup is None or key in self._stale_rollups:
+            # Сводка месяца и так будет пересчитана целиком
+            return
+        deltas = {}
+        for day, employee in {(day, employee) for day, employee, _ in changes}:
+            previous = month_schedule.matrix.shift(day, employee)
+            shift = published.matrix.shift(day, employee)
+            if previous == shift:
+                continue
+            for code, delta in ((previous, -1), (shift, 1)):
+                if code is not None:
+                    deltas[(employee, code)] = deltas.get((employee, code), 0) + delta
+        try:
+            self.rollup.apply(month_schedule.year, month_schedule.month, deltas)
+        except Exception:
+            logger.exception("Не удалось обновить сводку смен за %02d.%d", month_schedule.month, month_schedule.year)
+            self._stale_rollups.add(key)
+
+    @staticmethod
+    def _period(year: int = None, month: int = None):
+        if year is None or month is None:
+            now = datetime.now()
+            year = now.year if year is None else year
+            month = now.month if month is None else month
+        return year, month
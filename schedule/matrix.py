@@ -0,0 +1,238 @@
+import logging
+import math
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Стандартные коды смен (см. ScheduleManager.ALLOWED_CODES) в порядке их номеров 1..5;
+# номер 0 — пустая ячейка.
+SHIFT_CODES = ("Р", "В", "К", "О", "Д")
+DUTY_CODE = "Д"
+EMPTY = 0
+
+
+class ShiftMatrix:
+    """
+    Компактное представление смен месяца: плотный массив дни × сотрудники (uint8).
+
+    - self.employees: кортеж ФИО; номер столбца — целочисленный id сотрудника,
+      сами строки интернированы (sys.intern), так что одинаковые ФИО в разных
+      месяцах и командах хранятся в памяти один раз;
+    - self.codes: таблица кодов смен, self.codes[i] — код с номером i
+      (0 — пустая ячейка, 1..5 — SHIFT_CODES, дальше — нестандартные коды из файла);
+    - self.days: номера дней по строкам массива (в порядке записей файла);
+    - self.data: массив номеров кодов shape (дни, сотрудники), только для чтения.
+
+    Кодом смены считаются только строки, как и при импорте в базу: NaN/None — пустая
+    ячейка, а числа, даты и другие не строковые значения тоже хранятся пустыми
+    (from_records пишет о таких ячейках предупреждение в лог).
+    Матрица не меняется: with_changes возвращает новую матрицу.
+    Привычный словарный вид ({"day", "shifts"}) доступен через records() и day(),
+    это тонкие представления поверх массива без копирования данных.
+    """
+
+    __slots__ = ("employees", "codes", "days", "data",
+                 "_employee_index", "_code_index", "_day_index", "_first_rows")
+
+    def __init__(self, employees, codes, days, data: np.ndarray):
+        self.employees = tuple(employees)
+        self.codes = tuple(codes)
+        self.days = days
+        self.data = data
+        self.data.flags.writeable = False
+        self._employee_index = {employee: column for column, employee in enumerate(self.employees)}
+        self._code_index = {code: number for number, code in enumerate(self.codes) if code is not None}
+        # Номер дня -> строка массива (при повторе дня — первая строка, как в MonthSchedule)
+        self._day_index = {}
+        for row, day in enumerate(days.tolist()):
+            self._day_index.setdefault(day, row)
+        self._first_rows = np.fromiter(self._day_index.values(), dtype=np.intp, count=len(self._day_index))
+
+    @classmethod
+    def from_records(cls, employees, schedules):
+        """
+        Строит матрицу из результата parse_schedule (employees, schedules).
+        """
+        # Повтор ФИО в шапке даёт в словаре смен один ключ — оставляем один столбец
+        employees = [sys.intern(str(employee)) for employee in dict.fromkeys(employees or ())]
+        codes = [None, *SHIFT_CODES]
+        code_index = {code: number for number, code in enumerate(codes) if code is not None}
+
+        days = np.fromiter((record["day"] for record in schedules), dtype=np.int16, count=len(schedules))
+        data = np.zeros((len(schedules), len(employees)), dtype=np.uint8)
+        dropped = []
+        for row, record in enumerate(schedules):
+            shifts = record["shifts"]
+            data[row] = [_encode(shifts.get(employee), code_index, codes) for employee in employees]
+            dropped.extend((record["day"], employee, value) for employee in employees
+                           if _is_dropped(value := shifts.get(employee)))
+        if dropped:
+            day, employee, value = dropped[0]
+            logger.warning("%d ячеек с не строковыми значениями считаются пустыми (например, день %s, %s: %r)",
+                           len(dropped), day, employee, value)
+        return cls(employees, codes, days, data)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Размер массивов матрицы в байтах (без таблиц ФИО и кодов).
+        """
+        return self.data.nbytes + self.days.nbytes
+
+    def has_day(self, day: int) -> bool:
+        return day in self._day_index
+
+    def has_employee(self, employee: str) -> bool:
+        return employee in self._employee_index
+
+    def shift(self, day: int, employee: str):
+        """
+        Код смены сотрудника в день или None (пустая ячейка).
+        """
+        return self.codes[self.data[self._day_index[day], self._employee_index[employee]]]
+
+    def day(self, day: int):
+        """
+        Смены дня как словарь только для чтения (сотрудник → код) или None, если дня нет.
+        """
+        row = self._day_index.get(day)
+        return DayShifts(self, row) if row is not None else None
+
+    def day_numbers(self):
+        """
+        Номера дней без повторов в порядке строк массива.
+        """
+        return tuple(self._day_index)
+
+    def mask(self, code: str) -> np.ndarray:
+        """
+        Булева маска (дни × сотрудники) ячеек с кодом code; строки — в порядке day_numbers().
+        """
+        number = self._code_index.get(code)
+        if number is None:
+            return np.zeros((len(self._first_rows), len(self.employees)), dtype=bool)
+        return self.data[self._first_rows] == number
+
+    def records(self):
+        """
+        Записи в формате parse_schedule: [{"day": <число>, "shifts": <смены дня>}, ...].
+        """
+        return [{"day": day, "shifts": DayShifts(self, row)} for row, day in enumerate(self.days.tolist())]
+
+    def on_duty(self, day: int, code: str = DUTY_CODE):
+        """
+        Сотрудники с кодом code в день (по умолчанию — дежурные) в порядке столбцов
+        или None, если дня нет.
+        """
+        row = self._day_index.get(day)
+        if row is None:
+            return None
+        number = self._code_index.get(code)
+        if number is None:
+            return ()
+        return tuple(self.employees[column] for column in np.flatnonzero(self.data[row] == number).tolist())
+
+    def employee_days(self, employee: str, code: str = DUTY_CODE):
+        """
+        Дни по возрастанию, в которые у сотрудника стоит код code.
+        """
+        column = self._employee_index.get(employee)
+        number = self._code_index.get(code)
+        if column is None or number is None:
+            return ()
+        # Каждый день учитывается один раз — по первой строке, как в day()
+        rows = self._first_rows
+        days = self.days[rows][self.data[rows, column] == number]
+        return tuple(np.sort(days).tolist())
+
+    def counts(self, code: str = DUTY_CODE):
+        """
+        Сколько дней у каждого сотрудника стоит код code: {ФИО: число}.
+        """
+        number = self._code_index.get(code)
+        if number is None:
+            return dict.fromkeys(self.employees, 0)
+        totals = (self.data[self._first_rows] == number).sum(axis=0)
+        return dict(zip(self.employees, totals.tolist()))
+
+    def code_totals(self) -> np.ndarray:
+        """
+        Сколько дней каждого кода у каждого сотрудника: массив int32 (номер кода × сотрудник).
+        Каждый день учитывается один раз — по первой строке, как в counts().
+        """
+        rows = self.data[self._first_rows]
+        columns = np.broadcast_to(np.arange(rows.shape[1]), rows.shape)
+        totals = np.zeros((len(self.codes), rows.shape[1]), dtype=np.int32)
+        np.add.at(totals, (rows.ravel(), columns.ravel()), 1)
+        return totals
+
+    def with_changes(self, changes):
+        """
+        Новая матрица с изменениями [(day, employee, shift), ...]; shift=None — пустая ячейка.
+        Копируется только массив кодов (байт на ячейку), таблица ФИО разделяется.
+        """
+        codes = list(self.codes)
+        code_index = dict(self._code_index)
+        # np.array, а не copy(): у снимка с диска data — np.memmap только для чтения
+        data = np.array(self.data, dtype=np.uint8)
+        for day, employee, shift in changes:
+            data[self._day_index[day], self._employee_index[employee]] = _encode(shift, code_index, codes)
+        return ShiftMatrix(self.employees, codes, self.days, data)
+
+
+class DayShifts(Mapping):
+    """
+    Смены одного дня — словарь только для чтения поверх строки ShiftMatrix.
+    """
+
+    __slots__ = ("_matrix", "_row")
+
+    def __init__(self, matrix: ShiftMatrix, row: int):
+        self._matrix = matrix
+        self._row = row
+
+    def __getitem__(self, employee):
+        column = self._matrix._employee_index[employee]
+        return self._matrix.codes[self._matrix.data[self._row, column]]
+
+    def __contains__(self, employee):
+        return employee in self._matrix._employee_index
+
+    def __iter__(self):
+        return iter(self._matrix.employees)
+
+    def __len__(self):
+        return len(self._matrix.employees)
+
+    def items(self):
+        codes = self._matrix.codes
+        return list(zip(self._matrix.employees, (codes[number] for number in self._matrix.data[self._row].tolist())))
+
+    def __repr__(self):
+        return f"DayShifts({dict(self.items())!r})"
+
+
+def _is_dropped(value) -> bool:
+    # Значение есть, но это не строка: в матрице оно станет пустой ячейкой
+    if value is None or isinstance(value, str):
+        return False
+    return not (isinstance(value, float) and math.isnan(value))
+
+
+def _encode(shift, code_index: dict, codes: list) -> int:
+    """
+    Номер кода смены; новые коды-строки дописываются в таблицу codes.
+    Не строки (NaN/None, числа, даты) — пустая ячейка EMPTY.
+    """
+    if not isinstance(shift, str):
+        return EMPTY
+    number = code_index.get(shift)
+    if number is None:
+        if len(codes) > np.iinfo(np.uint8).max:
+            raise ValueError("Слишком много различных кодов смен для uint8.")
+        number = code_index[shift] = len(codes)
+        codes.append(sys.intern(shift))
+    return number
@@ -0,0 +1,70 @@
+from types import MappingProxyType
+
+from .matrix import ShiftMatrix, DUTY_CODE
+
+
+class MonthSchedule:
+    """
+    Неизменяемый снимок расписания одного месяца поверх компактной ShiftMatrix.
+
+    Атрибуты:
+      - self.year, self.month: период;
+      - self.employees: кортеж сотрудников (ФИО);
+      - self.matrix: ShiftMatrix — массив дни × сотрудники с кодами смен (uint8);
+      - self.schedules: кортеж записей {"day": <число>, "shifts": {<сотрудник>: <код смены>, ...}}
+        (записи и словари смен — только для чтения, это представления поверх матрицы;
+        пустая ячейка — None).
+
+    Запросы (дежурные на день, дни сотрудника, число смен по сотрудникам) выполняются
+    векторно по массиву матрицы.
+
+    Снимок никогда не меняется: изменения создают новый снимок через with_changes
+    (копируется только массив кодов — байт на ячейку, таблица ФИО разделяется).
+    Поэтому снимок можно читать из любого потока без блокировок.
+    """
+
+    def __init__(self, year: int, month: int, employees, schedules, matrix: ShiftMatrix = None):
+        self.year = year
+        self.month = month
+        self.matrix = matrix if matrix is not None else ShiftMatrix.from_records(employees, schedules)
+        self.employees = self.matrix.employees
+
+    @property
+    def schedules(self):
+        return tuple(MappingProxyType(record) for record in self.matrix.records())
+
+    def with_changes(self, changes):
+        """
+        Возвращает новый снимок с применёнными изменениями (copy-on-write).
+
+        :param changes: последовательность (day, employee, shift); день и сотрудник должны существовать.
+        :return: новый MonthSchedule (или self, если изменений нет).
+        """
+        changes = list(changes)
+        if not changes:
+            return self
+        return MonthSchedule(self.year, self.month, None, None, matrix=self.matrix.with_changes(changes))
+
+    def day(self, day: int):
+        """
+        Смены на день (сотрудник → код смены, только чтение) или None.
+        """
+        return self.matrix.day(day)
+
+    def on_duty(self, day: int):
+        """
+        Дежурные на день в порядке столбцов таблицы или None, если дня нет.
+        """
+        return self.matrix.on_duty(day)
+
+    def employee_days(self, employee: str, code: str = DUTY_CODE):
+        """
+        Кортеж дней по возрастанию, в которые у сотрудника стоит код смены.
+        """
+        return self.matrix.employee_days(employee, code)
+
+    def counts(self, code: str = DUTY_CODE):
+        """
+        Число дней с кодом смены у каждого сотрудника: {ФИО: число}.
+        """
+        return self.matrix.counts(code)
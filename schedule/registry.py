@@ -0,0 +1,153 @@
+import os
+import threading
+from collections import OrderedDict
+
+from .manager import ScheduleManager
+
+
+class TeamRegistry:
+    """
+    Реестр команд: чат Telegram → каталог с файлами команды → ScheduleManager.
+
+    Менеджер команды создаётся при первом обращении из её чата, а месяцы внутри
+    него по-прежнему загружаются лениво, так что при старте не читается ни один файл.
+    Несколько чатов могут указывать на один каталог и делят один менеджер.
+
+    Загруженные менеджеры хранятся в порядке последнего использования (LRU).
+    Когда их суммарная память (ScheduleManager.memory_usage) превышает memory_budget,
+    давно не использовавшиеся менеджеры выгружаются; при следующем запросе
+    команда загрузится заново. Закреплённые менеджеры (pin) не выгружаются.
+    """
+
+    def __init__(self, teams: dict = None, default_directory: str = None, memory_budget: int = 256 * 1024 * 1024,
+                 manager_factory=None):
+        """
+        :param teams: словарь {chat id (строка или число): каталог команды}.
+        :param default_directory: каталог для чатов, которых нет в teams (None — таким чатам отказать).
+        :param memory_budget: предел памяти загруженных менеджеров в байтах.
+        :param manager_factory: функция каталог → ScheduleManager (в боте — config.create_team_manager);
+                                без неё реестр выдаёт только закреплённые (pin) менеджеры.
+        """
+        self.teams = {str(chat_id): _normalize(directory) for chat_id, directory in (teams or {}).items()}
+        self.default_directory = _normalize(default_directory) if default_directory else None
+        self.memory_budget = memory_budget
+        self.manager_factory = manager_factory
+        self._lock = threading.Lock()
+        # каталог -> ScheduleManager, от давно использованных к недавним
+        self._managers = OrderedDict()
+        # каталог -> оценка памяти менеджера
+        self._usage = {}
+        # Выданные с прошлой проверки менеджеры: они могли загрузить месяцы, их память пересчитывается
+        self._dirty = set()
+        self._pinned = set()
+        self.evictions = 0
+
+    def directory_for(self, chat_id):
+        """
+        Каталог команды для чата или None, если чат не привязан и каталога по умолчанию нет.
+        """
+        if chat_id is None:
+            return self.default_directory
+        return self.teams.get(str(chat_id), self.default_directory)
+
+    def manager_for(self, chat_id):
+        """
+        Менеджер расписаний команды чата (создаётся при первом обращении) или None.
+        """
+        directory = self.directory_for(chat_id)
+        if directory is None:
+            return None
+        return self.manager_for_directory(directory)
+
+    def manager_for_directory(self, directory: str):
+        """
+        Менеджер команды по каталогу (создаётся при первом обращении) или None,
+        если менеджера нет, а manager_factory не задана.
+        """
+        directory = _normalize(directory)
+        with self._lock:
+            self._refresh_usage()
+            manager = self._managers.get(directory)
+            if manager is not None:
+                self._managers.move_to_end(directory)
+                self._dirty.add(directory)
+                self._evict(keep=directory)
+                return manager
+
+        if self.manager_factory is None:
+            return None
+        # Создание менеджера лёгкое (файлы читаются позже), но делается вне блокировки
+        manager = self.manager_factory(directory)
+        with self._lock:
+            existing = self._managers.get(directory)
+            if existing is not None:
+                self._managers.move_to_end(directory)
+                return existing
+            self._managers[directory] = manager
+            self._usage[directory] = 0
+            self._dirty.add(directory)
+            self._evict(keep=directory)
+        return manager
+
+    def pin(self, directory: str, manager: ScheduleManager):
+        """
+        Регистрирует готовый менеджер для каталога и защищает его от выгрузки.
+        """
+        directory = _normalize(directory)
+        with self._lock:
+            self._managers[directory] = manager
+            self._usage[directory] = manager.memory_usage()
+            self._pinned.add(directory)
+
+    def managers(self):
+        """
+        Загруженные сейчас менеджеры: список (каталог, ScheduleManager).
+        """
+        with self._lock:
+            return list(self._managers.items())
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            self._refresh_usage()
+            return sum(self._usage.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh_usage()
+            return {
+                "managers": len(self._managers),
+                "pinned": len(self._pinned),
+                "memory": sum(self._usage.values()),
+                "memory_budget": self.memory_budget,
+                "evictions": self.evictions,
+            }
+
+    def _refresh_usage(self):
+        # Память менеджера меняется, когда он загружает месяцы, т.е. после выдачи из реестра
+        for directory in self._dirty:
+            manager = self._managers.get(directory)
+            if manager is not None:
+                self._usage[directory] = manager.memory_usage()
+        self._dirty.clear()
+
+    def _evict(self, keep: str):
+        """
+        Выгружает менеджеры от давно использованных, пока память выше бюджета.
+        Вызывается под self._lock.
+        """
+        total = sum(self._usage.values())
+        if total <= self.memory_budget:
+            return
+        for directory in list(self._managers):
+            if total <= self.memory_budget:
+                break
+            if directory == keep or directory in self._pinned:
+                continue
+            del self._managers[directory]
+            total -= self._usage.pop(directory)
+            self._dirty.discard(directory)
+            self.evictions += 1
+
+
+def _normalize(directory: str) -> str:
+    return os.path.normpath(directory)
@@ -0,0 +1,77 @@
+import logging
+
+from .matrix import EMPTY
+
+logger = logging.getLogger(__name__)
+
+
+class ShiftCountRollup:
+    """
+    Сводка shift_counts одной команды в базе, которую поддерживает её ScheduleManager.
+
+    При загрузке (и перезагрузке) месяца сводка месяца пересчитывается по матрице целиком
+    и помечается версией файла (shift_count_sources); swap_shifts, change_status и
+    generate_roster меняют её на +1/-1 по изменённым ячейкам. Менеджер пишет в сводку
+    синхронно, под своей блокировкой писателей, поэтому загрузки и изменения попадают
+    в базу в том же порядке, что и в память.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: каталог с файлами команды; по нему строится ключ команды (db.team_key).
+        """
+        # Импорт здесь: модель БД нужна только менеджерам со сводкой
+        from db import team_key
+
+        self.team = team_key(directory)
+        self._db_ready = False
+
+    def replace_month(self, month_schedule, version):
+        """
+        Пересчитывает сводку месяца по снимку month_schedule, загруженному из версии файла version.
+        """
+        from db import Session, replace_shift_counts, resolve_employee_ids
+
+        matrix = month_schedule.matrix
+        totals = matrix.code_totals()
+        self._ensure_db()
+        with Session() as session, session.begin():
+            employee_ids = resolve_employee_ids(session, matrix.employees)
+            rows = [
+                {"employee_id": employee_ids[employee], "shift": matrix.codes[number], "count": count}
+                for number, counts in enumerate(totals.tolist()) if number != EMPTY
+                for employee, count in zip(matrix.employees, counts) if count
+            ]
+            replace_shift_counts(session, self.team, month_schedule.year, month_schedule.month, rows, version)
+
+    def apply(self, year: int, month: int, deltas):
+        """
+        Применяет изменения счётчиков месяца: {(ФИО, код): изменение}.
+        """
+        from db import Session, apply_shift_count_deltas, resolve_employee_ids
+
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self._ensure_db()
+        with Session() as session, session.begin():
+            employee_ids = resolve_employee_ids(session, (employee for employee, _ in deltas))
+            apply_shift_count_deltas(session, self.team, {
+                (employee_ids[employee], year, month, code): delta for (employee, code), delta in deltas.items()
+            })
+
+    def versions(self, start, end) -> dict:
+        """
+        Версии файлов, по которым пересчитаны месяцы [start, end]: {(год, месяц): (mtime_ns, размер)}.
+        """
+        from db import shift_count_sources
+
+        self._ensure_db()
+        return shift_count_sources(self.team, start, end)
+
+    def _ensure_db(self):
+        if not self._db_ready:
+            from db import init_db
+
+            init_db()
+            self._db_ready = True
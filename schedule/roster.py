@@ -0,0 +1,252 @@
+import random
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from .matrix import DUTY_CODE, ShiftMatrix
+
+# Коды, поверх которых дежурство не ставится: отпуск, конкурс, выходной.
+BLOCKING_CODES = ("О", "К", "В")
+# Минимум свободных дней между двумя дежурствами одного сотрудника.
+DEFAULT_MIN_REST = 2
+
+
+class RosterState:
+    """
+    Состояние графика дежурств месяца с инкрементальной проверкой ограничений.
+
+    По матрице смен один раз (векторно) строятся отсортированные списки дней
+    дежурств каждого сотрудника и число дежурных на каждый день; дальше любое
+    изменение ячейки обновляет их за O(log n), а проверка "можно ли поставить
+    дежурство" смотрит только на соседние дежурства этого сотрудника.
+
+    Ограничения:
+      - дежурство не ставится на ячейки с кодами blocking (по умолчанию "О", "К", "В");
+      - между двумя дежурствами одного сотрудника не меньше min_rest свободных дней
+        (при min_rest=2 подряд можно дежурить 1-го и 4-го, но не 1-го и 3-го);
+      - если задан duty_per_day, в каждый день дежурят не меньше duty_per_day человек.
+
+    Исходная матрица не меняется: изменения копятся в self.changes поверх неё.
+    """
+
+    def __init__(self, matrix: ShiftMatrix, min_rest: int = DEFAULT_MIN_REST, duty_per_day=None,
+                 blocking=BLOCKING_CODES):
+        """
+        :param duty_per_day: число дежурных в день — int или словарь {день: число}; None — не проверять.
+        """
+        self.matrix = matrix
+        self.min_rest = min_rest
+        self.duty_per_day = duty_per_day
+        self.blocking = frozenset(blocking)
+        # (день, ФИО) -> новый код поверх матрицы
+        self.changes = {}
+
+        day_numbers = np.array(matrix.day_numbers(), dtype=np.int64)
+        order = np.argsort(day_numbers, kind="stable")
+        self.days = tuple(day_numbers[order].tolist())
+        duty = matrix.mask(DUTY_CODE)[order]
+        self._duty_days = {
+            employee: day_numbers[order][duty[:, column]].tolist()
+            for column, employee in enumerate(matrix.employees)
+        }
+        self._day_duty = dict(zip(self.days, duty.sum(axis=1).tolist()))
+
+    def shift(self, day: int, employee: str):
+        key = (day, employee)
+        if key in self.changes:
+            return self.changes[key]
+        return self.matrix.shift(day, employee)
+
+    def duty_days(self, employee: str):
+        return tuple(self._duty_days.get(employee, ()))
+
+    def duty_count(self, employee: str) -> int:
+        return len(self._duty_days.get(employee, ()))
+
+    def day_duty(self, day: int) -> int:
+        return self._day_duty.get(day, 0)
+
+    def required(self, day: int) -> int:
+        if self.duty_per_day is None:
+            return 0
+        if isinstance(self.duty_per_day, dict):
+            return self.duty_per_day.get(day, 0)
+        return self.duty_per_day
+
+    def rest_conflict(self, day: int, employee: str):
+        """
+        Ближайший день дежурства employee, слишком близкий к day (сам day не считается), или None.
+        """
+        duty_days = self._duty_days.get(employee, ())
+        index = bisect_left(duty_days, day)
+        if index < len(duty_days) and duty_days[index] == day:
+            after = index + 1
+        else:
+            after = index
+        if index > 0 and day - duty_days[index - 1] <= self.min_rest:
+            return duty_days[index - 1]
+        if after < len(duty_days) and duty_days[after] - day <= self.min_rest:
+            return duty_days[after]
+        return None
+
+    def can_assign(self, day: int, employee: str) -> bool:
+        """
+        Можно ли поставить employee дежурство на day, не нарушив ограничений.
+        """
+        if day not in self._day_duty or employee not in self._duty_days:
+            return False
+        shift = self.shift(day, employee)
+        if shift == DUTY_CODE or shift in self.blocking:
+            return False
+        return self.rest_conflict(day, employee) is None
+
+    def set(self, day: int, employee: str, code):
+        """
+        Ставит код в ячейку и обновляет индексы дежурств. Возвращает прежний код.
+        """
+        previous = self.shift(day, employee)
+        if previous == code:
+            return previous
+        duty_days = self._duty_days[employee]
+        if previous == DUTY_CODE:
+            duty_days.pop(bisect_left(duty_days, day))
+            self._day_duty[day] -= 1
+        if code == DUTY_CODE:
+            insort(duty_days, day)
+            self._day_duty[day] += 1
+        if code == self.matrix.shift(day, employee):
+            self.changes.pop((day, employee), None)
+        else:
+            self.changes[(day, employee)] = code
+        return previous
+
+    def rebase(self, matrix: ShiftMatrix):
+        """
+        Переносит состояние на новую матрицу, в которой уже есть все накопленные изменения
+        (например, на матрицу нового снимка месяца после записи тех же изменений через set).
+        Индексы дежурств при этом не пересчитываются.
+        """
+        self.matrix = matrix
+        self.changes = {}
+
+    def check(self, changes):
+        """
+        Проверяет предлагаемые изменения [(день, ФИО, новый код), ...], не применяя их.
+
+        Проверяются только затронутые ячейки и соседние с ними дежурства, так что
+        проверка обмена или смены статуса стоит O(log n) на изменение.
+
+        :return: список нарушений (вид, день, ФИО, подробность), пустой — если изменения допустимы.
+                 Виды: "unknown" — нет такого дня или сотрудника, "blocked" — дежурство поверх
+                 кода из blocking (подробность — этот код), "rest" — слишком близко к другому
+                 дежурству (подробность — его день), "coverage" — в день становится меньше
+                 duty_per_day дежурных (подробность — сколько остаётся; ФИО — None).
+        """
+        violations = []
+        applied = []
+        before = {}
+        try:
+            for day, employee, code in changes:
+                if day not in self._day_duty or employee not in self._duty_days:
+                    violations.append(("unknown", day, employee, None))
+                    continue
+                before.setdefault(day, self._day_duty[day])
+                previous = self.shift(day, employee)
+                if code == DUTY_CODE and previous != DUTY_CODE and previous in self.blocking:
+                    violations.append(("blocked", day, employee, previous))
+                applied.append((day, employee, self.set(day, employee, code)))
+
+            for day, employee, _ in applied:
+                if self.shift(day, employee) == DUTY_CODE:
+                    conflict = self.rest_conflict(day, employee)
+                    if conflict is not None:
+                        violations.append(("rest", day, employee, conflict))
+            for day, count in before.items():
+                # Недобор, который был и до изменений, им не вменяется
+                if self._day_duty[day] < min(count, self.required(day)):
+                    violations.append(("coverage", day, None, self._day_duty[day]))
+        finally:
+            for day, employee, previous in reversed(applied):
+                self.set(day, employee, previous)
+        return violations
+
+    def fill(self, history=None, seed=None):
+        """
+        Дозаполняет дежурства до duty_per_day в каждый день.
+
+        Дни обходятся по порядку; в каждый день из сотрудников, которым можно поставить
+        дежурство, берутся те, у кого меньше всего дежурств (с учётом history), а при
+        равенстве — кто дольше не дежурил; оставшиеся равные выбираются случайно (seed).
+
+        :param history: словарь ФИО → число дежурств до этого месяца (для равномерности между месяцами).
+        :return: (назначения [(день, ФИО), ...], недобор {день: сколько не хватило}).
+        """
+        rng = random.Random(seed)
+        history = history or {}
+        employees = list(self._duty_days)
+        load = {employee: history.get(employee, 0) + self.duty_count(employee) for employee in employees}
+        assigned = []
+        unfilled = {}
+
+        for day in self.days:
+            need = self.required(day) - self._day_duty[day]
+            if need <= 0:
+                continue
+            candidates = []
+            for employee in employees:
+                if self.can_assign(day, employee):
+                    duty_days = self._duty_days[employee]
+                    index = bisect_left(duty_days, day)
+                    last = duty_days[index - 1] if index > 0 else float("-inf")
+                    candidates.append((load[employee], last, rng.random(), employee))
+            candidates.sort()
+            chosen = 0
+            for _, _, _, employee in candidates:
+                if chosen == need:
+                    break
+                # Выбор одного сотрудника не влияет на допустимость других в этот день
+                self.set(day, employee, DUTY_CODE)
+                load[employee] += 1
+                assigned.append((day, employee))
+                chosen += 1
+            if chosen < need:
+                unfilled[day] = need - chosen
+        return assigned, unfilled
+
+    def records(self):
+        """
+        Расписание с учётом изменений в привычном виде [{"day", "shifts": {ФИО: код}}, ...].
+        """
+        records = []
+        for record in self.matrix.records():
+            day = record["day"]
+            shifts = dict(record["shifts"])
+            for employee in shifts:
+                key = (day, employee)
+                if key in self.changes:
+                    shifts[employee] = self.changes[key]
+            records.append({"day": day, "shifts": shifts})
+        return records
+
+
+def generate_roster(matrix: ShiftMatrix, duty_per_day=1, min_rest: int = DEFAULT_MIN_REST,
+                    blocking=BLOCKING_CODES, history=None, seed=None):
+    """
+    Составляет график дежурств месяца поверх существующих смен (см. RosterState.fill).
+
+    Уже стоящие дежурства сохраняются и засчитываются; коды из blocking не трогаются.
+
+    :return: словарь:
+             "schedules" — расписание в виде [{"day", "shifts"}, ...] с новыми дежурствами,
+             "assigned" — новые дежурства [(день, ФИО), ...],
+             "unfilled" — {день: сколько дежурных не хватило},
+             "counts" — {ФИО: число дежурств в месяце}.
+    """
+    state = RosterState(matrix, min_rest=min_rest, duty_per_day=duty_per_day, blocking=blocking)
+    assigned, unfilled = state.fill(history=history, seed=seed)
+    return {
+        "schedules": state.records(),
+        "assigned": assigned,
+        "unfilled": unfilled,
+        "counts": {employee: state.duty_count(employee) for employee in matrix.employees},
+    }
@@ -0,0 +1,125 @@
+import contextlib
+import json
+import logging
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .matrix import ShiftMatrix
+
+logger = logging.getLogger(__name__)
+
+# Снимок лежит рядом с файлом: "<файл>.xlsx.snap"
+SNAPSHOT_SUFFIX = ".snap"
+
+MAGIC = b"DUTYSNAP"
+FORMAT_VERSION = 1
+# Выравнивание начала массива в файле
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sII")
+
+
+def snapshot_path(workbook_path: str) -> str:
+    return workbook_path + SNAPSHOT_SUFFIX
+
+
+def write_snapshot(path: str, matrix: ShiftMatrix, source_signature):
+    """
+    Записывает скомпилированный снимок матрицы смен.
+
+    Формат: MAGIC, версия формата и длина заголовка (struct "<8sII"), заголовок JSON
+    (ФИО, таблица кодов, дни, форма массива, отпечаток исходного файла), затем
+    с выравниванием ALIGNMENT — массив кодов uint8 построчно. Файл пишется
+    в уникальный временный файл рядом и переименовывается, так что читатели не видят
+    его недописанным, а одновременные писатели не портят друг другу данные.
+
+    :param source_signature: (mtime_ns, размер) файла .xlsx, из которого построена матрица.
+    """
+    rows, columns = matrix.data.shape
+    header = json.dumps({
+        "source": list(source_signature),
+        "employees": list(matrix.employees),
+        "codes": list(matrix.codes),
+        "days": matrix.days.tolist(),
+        "shape": [rows, columns],
+    }, ensure_ascii=False).encode("utf-8")
+    offset = _data_offset(len(header))
+
+    # Свой временный файл у каждого писателя: менеджер и compile_snapshots (или несколько
+    # копий бота) могут компилировать один снимок одновременно
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (offset - _PREFIX.size - len(header)))
+            f.write(np.ascontiguousarray(matrix.data, dtype=np.uint8).tobytes())
+        # mkstemp создаёт файл с правами 0600; снимок, как и сам файл .xlsx, читают все
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def read_snapshot(path: str, source_signature=None):
+    """
+    Загружает снимок: массив кодов отображается в память (np.memmap) без чтения в кучу.
+
+    :param source_signature: ожидаемый отпечаток исходного файла; если снимок построен
+                             из другой версии файла, он считается устаревшим.
+    :return: ShiftMatrix или None, если снимка нет, он устарел или повреждён.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                return None
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        if source_signature is not None and tuple(header["source"]) != tuple(source_signature):
+            return None
+
+        rows, columns = header["shape"]
+        offset = _data_offset(header_len)
+        if rows * columns:
+            data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(rows, columns))
+        else:
+            # memmap не умеет отображать пустой массив
+            data = np.zeros((rows, columns), dtype=np.uint8)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, struct.error):
+        logger.warning("Повреждённый снимок расписания %s, файл будет разобран заново", path)
+        return None
+
+    days = np.array(header["days"], dtype=np.int16)
+    codes = [None if code is None else str(code) for code in header["codes"]]
+    return ShiftMatrix(header["employees"], codes, days, data)
+
+
+def compile_workbook(workbook_path: str, parse=None):
+    """
+    Разбирает файл .xlsx и записывает снимок рядом с ним.
+
+    :param parse: функция разбора (по умолчанию — parse_schedule; pandas импортируется только здесь).
+    :return: ShiftMatrix или None, если таблица в файле не найдена.
+    """
+    if parse is None:
+        from excel_parser.parser import parse_schedule as parse
+
+    stat = os.stat(workbook_path)
+    employees, schedules = parse(workbook_path)
+    if employees is None or schedules is None:
+        return None
+    matrix = ShiftMatrix.from_records(employees, schedules)
+    write_snapshot(snapshot_path(workbook_path), matrix, (stat.st_mtime_ns, stat.st_size))
+    return matrix
+
+
+def _data_offset(header_len: int) -> int:
+    end = _PREFIX.size + header_len
+    return (end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,36 @@
+import argparse
+import os
+
+from schedule.snapshot import compile_workbook, read_snapshot, snapshot_path
+
+
+def compile_directory(directory: str, force: bool = False):
+    """
+    Компилирует снимки "<файл>.xlsx.snap" для всех файлов расписания в каталоге.
+
+    Актуальные снимки (построенные из той же версии файла) пропускаются, если не задан force.
+
+    :return: список (имя файла, состояние), где состояние — "compiled", "fresh" или "no table".
+    """
+    results = []
+    for file in sorted(os.listdir(directory)):
+        if not file.lower().endswith('.xlsx'):
+            continue
+        path = os.path.join(directory, file)
+        stat = os.stat(path)
+        if not force and read_snapshot(snapshot_path(path), (stat.st_mtime_ns, stat.st_size)) is not None:
+            results.append((file, "fresh"))
+            continue
+        matrix = compile_workbook(path)
+        results.append((file, "compiled" if matrix is not None else "no table"))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Компиляция снимков расписаний для быстрого старта бота.")
+    parser.add_argument("directory", nargs="?", default="excel_parser/data/M")
+    parser.add_argument("--force", action="store_true", help="перекомпилировать и актуальные снимки")
+    args = parser.parse_args()
+
+    for file, state in compile_directory(args.directory, args.force):
+        print(f"{file}: {state}")
@@ -1,10 +1,18 @@
+import argparse
+import hashlib
 import re
 import os
-from db.session import Session
-from db.models import Employee, Schedule
+from concurrent.futures import ProcessPoolExecutor
+from db import (Employee, Session, apply_shift_count_deltas, delete_schedules, diff_schedules,
+                forget_shift_count_source, imported_hashes, init_db, record_import, refresh_shift_counts,
+                resolve_employee_ids, shift_count_deltas, team_key, update_schedule_shifts, upsert_schedules)
+from sqlalchemy import select
 from excel_parser.parser import parse_schedule
 from typing import Tuple
 
+# Сколько смен накапливать перед записью одной транзакцией при импорте каталога
+IMPORT_BATCH_ROWS = 50000
+
 def extract_period_from_filename(filename: str) -> Tuple[int, int]:
     # реализация функции
 
@@ -42,6 +50,13 @@ def import_excel_to_db(excel_file: str):
     Функция автоматически извлекает месяц и год из имени файла,
     затем с помощью функции parse_schedule получает данные из Excel,
     и сохраняет их в базу данных с использованием SQLAlchemy.
+
+    Импорт выполняется пакетно в одной транзакции:
+      - все сотрудники находятся одним запросом, недостающие добавляются одной вставкой;
+      - строки расписания пишутся одним upsert по (year, month, day, employee_id),
+        поэтому повторный импорт того же файла безопасен и не создаёт дубликатов.
+    Пустые ячейки (NaN/None) не импортируются: код смены в базе обязателен.
+    Хэш содержимого файла запоминается (imported_files), и import_directory его уже не разбирает.
     
     :param excel_file: Путь к Excel-файлу, например "excel_parser/data/02...2025.xlsx"
     """
@@ -59,46 +74,279 @@ def import_excel_to_db(excel_file: str):
     if not employees_list or not schedule_data:
         print("Ошибка: не удалось получить данные из Excel.")
         return
-    
-    session = Session()
-    
-    # Обработка списка сотрудников: для каждого сотрудника проверяем, есть ли он в базе,
-    # и если нет – добавляем его.
-    for emp_name in employees_list:
-        employee = session.query(Employee).filter_by(name=emp_name).first()
-        if not employee:
-            employee = Employee(name=emp_name)
-            session.add(employee)
-            session.commit()  # Коммитим сразу для получения employee.id
-    
-    # Обработка расписания: schedule_data – список записей вида:
-    # { "day": <число дня>, "shifts": { "<employee>": "<shift_code>", ... } }
+
+    init_db()
+
+    with Session() as session, session.begin():
+        # Сотрудники: один запрос на поиск и одна пакетная вставка недостающих
+        employee_ids = resolve_employee_ids(session, employees_list)
+
+        # Обработка расписания: schedule_data – список записей вида:
+        # { "day": <число дня>, "shifts": { "<employee>": "<shift_code>", ... } }
+        rows = build_schedule_rows(year, month, schedule_data, employee_ids)
+        upsert_schedules(session, rows)
+        refresh_shift_counts(session, team_key(os.path.dirname(excel_file)), year, month, employee_ids.values())
+        record_import(session, file_hash(excel_file), base_filename, year, month, len(rows))
+
+    print(f"Импорт данных завершен успешно: {len(employee_ids)} сотрудников, {len(rows)} смен.")
+
+
+def build_schedule_rows(year: int, month: int, schedule_data, employee_ids: dict):
+    """
+    Превращает результат parse_schedule в строки для пакетной записи в таблицу schedules.
+
+    :param employee_ids: словарь ФИО → id (см. resolve_employee_ids).
+    :return: список словарей {"year", "month", "day", "employee_id", "shift"}.
+    """
+    rows = []
     for record in schedule_data:
         day = record["day"]
-        shifts = record["shifts"]
-        for emp_name, shift in shifts.items():
-            # Получаем сотрудника из базы (он уже должен быть добавлен)
-            employee = session.query(Employee).filter_by(name=emp_name).first()
-            if not employee:
-                # Обычно этого не должно случаться, так как сотрудники обработаны выше
-                employee = Employee(name=emp_name)
-                session.add(employee)
-                session.commit()
-            # Создаем новую запись расписания для каждого сотрудника на соответствующий день
-            new_schedule = Schedule(
-                year=year,
-                month=month,
-                day=day,
-                employee_id=employee.id,
-                shift=shift
-            )
-            session.add(new_schedule)
-    
-    # Фиксируем изменения в базе данных
-    session.commit()
-    session.close()
-    print("Импорт данных завершен успешно.")
+        for emp_name, shift in record["shifts"].items():
+            if not isinstance(shift, str) or not shift.strip():
+                continue
+            rows.append({
+                "year": year,
+                "month": month,
+                "day": day,
+                "employee_id": employee_ids[emp_name],
+                "shift": shift,
+            })
+    return rows
+
+
+def reimport_excel_to_db(excel_file: str):
+    """
+    Повторный импорт отредактированного файла: в базу пишутся только отличия.
+
+    Свежий результат parse_schedule сравнивается с тем, что хранится за (год, месяц)
+    из имени файла (см. diff_schedules), и в одной транзакции выполняются:
+      - INSERT — для появившихся ячеек (в том числе у новых сотрудников),
+      - UPDATE — для ячеек, где сменился код,
+      - DELETE — для ячеек, которые стали пустыми или пропали вместе с сотрудником.
+    Неизменные строки не трогаются, так что объём записи зависит от числа правок,
+    а не от размера таблицы.
+
+    :param excel_file: путь к Excel-файлу с именем вида "[номер месяца]...год.xlsx".
+    :return: отчёт об изменениях или None, если файл не удалось разобрать:
+             {"year", "month",
+              "added": [(день, ФИО, код), ...],
+              "changed": [(день, ФИО, прежний код, новый код), ...],
+              "removed": [(день, ФИО, прежний код), ...],
+              "employees_added": [ФИО, ...] — сотрудники, которых в месяце не было,
+              "employees_removed": [ФИО, ...] — сотрудники, у которых в месяце не осталось смен}.
+    """
+    base_filename = os.path.basename(excel_file)
+    try:
+        month, year = extract_period_from_filename(base_filename)
+    except ValueError as e:
+        print(f"Ошибка извлечения периода из имени файла: {e}")
+        return None
+
+    employees_list, schedule_data = parse_schedule(excel_file)
+    if not employees_list or not schedule_data:
+        print("Ошибка: не удалось получить данные из Excel.")
+        return None
+
+    init_db()
+
+    with Session() as session, session.begin():
+        employee_ids = resolve_employee_ids(session, employees_list)
+        rows = build_schedule_rows(year, month, schedule_data, employee_ids)
+        inserts, updates, deletes = diff_schedules(session, year, month, rows)
+
+        upsert_schedules(session, inserts)
+        update_schedule_shifts(session, updates)
+        delete_schedules(session, deletes)
+        team = team_key(os.path.dirname(excel_file))
+        apply_shift_count_deltas(session, team, shift_count_deltas(inserts, updates, deletes))
+        forget_shift_count_source(session, team, year, month)
+        record_import(session, file_hash(excel_file), base_filename, year, month, len(rows))
+
+        names = {employee_id: name for name, employee_id in employee_ids.items()}
+        unknown = {key["employee_id"] for key in deletes} - names.keys()
+        if unknown:
+            names.update(session.execute(select(Employee.id, Employee.name).where(Employee.id.in_(unknown))).all())
+
+    # Сотрудники со сменами в месяце до и после импорта: были — все строки, кроме вставленных, и удалённые
+    inserted = {(row["day"], row["employee_id"]) for row in inserts}
+    new_ids = {row["employee_id"] for row in rows}
+    old_ids = ({row["employee_id"] for row in rows if (row["day"], row["employee_id"]) not in inserted}
+               | {key["employee_id"] for key in deletes})
+    report = {
+        "year": year,
+        "month": month,
+        "added": [(row["day"], names[row["employee_id"]], row["shift"]) for row in inserts],
+        "changed": [(row["day"], names[row["employee_id"]], row["previous"], row["shift"]) for row in updates],
+        "removed": [(key["day"], names[key["employee_id"]], key["previous"]) for key in deletes],
+        "employees_added": sorted(names[employee_id] for employee_id in new_ids - old_ids),
+        "employees_removed": sorted(names[employee_id] for employee_id in old_ids - new_ids),
+    }
+    print(f"Повторный импорт {month:02d}.{year}: добавлено {len(inserts)}, изменено {len(updates)}, "
+          f"удалено {len(deletes)} смен.")
+    return report
+
+
+def file_hash(path: str) -> str:
+    """
+    sha256 содержимого файла (hex): по нему определяется, импортирован ли файл.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def import_directory(directory: str, workers: int = None, force: bool = False, progress=None):
+    """
+    Импортирует все файлы .xlsx из каталога (включая подкаталоги) в базу данных.
+
+    Разбор файлов (pandas, упирается в процессор) идёт параллельно в пуле из workers
+    процессов (по умолчанию — по числу ядер). В базу пишет только текущий процесс:
+    результаты копятся и записываются пакетами по IMPORT_BATCH_ROWS смен, по одной
+    транзакции на пакет, вместе с отметками об импорте файлов (imported_files).
+    Файлы пишутся в порядке имён, так что при нескольких файлах за один месяц
+    результат не зависит от того, какой из них разобран раньше.
+
+    Файлы, содержимое которых уже импортировалось (по sha256), не разбираются, если не задан force.
+
+    :param progress: функция progress(готово, всего, имя файла, состояние), вызывается
+                     по каждому файлу; состояние — "imported", "skipped" (уже импортирован),
+                     "duplicate" (то же содержимое встречается в каталоге раньше),
+                     "bad name" (период не извлекается из имени), "no table" или "error"
+                     (файл не удалось разобрать — остальные файлы импортируются).
+    :return: словарь {состояние: число файлов} и "rows" — число записанных смен.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths.extend(os.path.join(root, file) for file in sorted(files) if file.lower().endswith(".xlsx"))
+
+    init_db()
+    total = len(paths)
+    summary = {"imported": 0, "skipped": 0, "duplicate": 0, "bad name": 0, "no table": 0, "error": 0,
+               "rows": 0}
+    done = 0
+
+    def report(path, status):
+        nonlocal done
+        done += 1
+        summary[status] += 1
+        if progress is not None:
+            progress(done, total, os.path.relpath(path, directory), status)
+
+    # Отбираем файлы до разбора: период из имени и хэш содержимого
+    hashes = {path: file_hash(path) for path in paths}
+    with Session() as session:
+        known = set() if force else imported_hashes(session, hashes.values())
+    jobs = []
+    seen = set()
+    for path in paths:
+        try:
+            month, year = extract_period_from_filename(os.path.basename(path))
+        except ValueError:
+            report(path, "bad name")
+            continue
+        content_hash = hashes[path]
+        if content_hash in known:
+            report(path, "skipped")
+        elif content_hash in seen:
+            report(path, "duplicate")
+        else:
+            seen.add(content_hash)
+            jobs.append((path, year, month, content_hash))
+
+    workers = workers or os.cpu_count() or 1
+    pending = []
+    pending_rows = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(jobs) > 1 else None
+    try:
+        mapper = pool.map if pool is not None else map
+        for (path, year, month, content_hash), parsed in zip(jobs, mapper(_parse_for_import, [job[0] for job in jobs])):
+            status, parsed = parsed
+            if status != "ok":
+                if status == "error":
+                    print(f"Ошибка разбора {path}: {parsed}")
+                report(path, status)
+                continue
+            pending.append((path, year, month, content_hash, parsed))
+            pending_rows += sum(len(record["shifts"]) for record in parsed[1])
+            if pending_rows >= IMPORT_BATCH_ROWS:
+                summary["rows"] += _write_batch(pending, report)
+                pending, pending_rows = [], 0
+        summary["rows"] += _write_batch(pending, report)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return summary
+
+
+def _parse_for_import(path: str):
+    """
+    Разбор файла в процессе пула.
+
+    :return: ("ok", (employees, schedules)) — только с непустыми кодами смен (меньше данных
+             передаётся между процессами), ("no table", None) или ("error", текст ошибки).
+    """
+    try:
+        employees, schedules = parse_schedule(path)
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}"
+    if not employees or not schedules:
+        return "no table", None
+    return "ok", (list(employees), [
+        {"day": int(record["day"]), "shifts": {
+            employee: shift for employee, shift in record["shifts"].items()
+            if isinstance(shift, str) and shift.strip()
+        }}
+        for record in schedules
+    ])
+
+
+def _write_batch(batch, report) -> int:
+    """
+    Записывает пакет разобранных файлов одной транзакцией. Возвращает число смен.
+    """
+    if not batch:
+        return 0
+    written = 0
+    with Session() as session, session.begin():
+        employee_ids = resolve_employee_ids(
+            session, (employee for _, _, _, _, (employees, _) in batch for employee in employees))
+        for path, year, month, content_hash, (employees, schedule_data) in batch:
+            rows = build_schedule_rows(year, month, schedule_data, employee_ids)
+            upsert_schedules(session, rows)
+            refresh_shift_counts(session, team_key(os.path.dirname(path)), year, month,
+                                 [employee_ids[employee] for employee in employees])
+            record_import(session, content_hash, os.path.basename(path), year, month, len(rows))
+            written += len(rows)
+    for path, *_ in batch:
+        report(path, "imported")
+    return written
+
 
 if __name__ == "__main__":
-    # Пример вызова: файл находится в "excel_parser/data" и имеет имя "02...2025.xlsx"
-    import_excel_to_db("excel_parser/data/02...2025.xlsx")
+    parser = argparse.ArgumentParser(description="Импорт расписаний из Excel в базу данных.")
+    parser.add_argument("path", nargs="?", default="excel_parser/data/M",
+                        help="файл .xlsx или каталог с файлами (имя файла: \"[номер месяца]...год.xlsx\")")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для разбора (по умолчанию — по числу ядер)")
+    parser.add_argument("--force", action="store_true", help="импортировать и уже импортированные файлы")
+    parser.add_argument("--diff", action="store_true",
+                        help="для файла: записать только отличия от базы и вывести список изменений")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        summary = import_directory(
+            args.path, args.workers, args.force,
+            progress=lambda done, total, name, status: print(f"[{done}/{total}] {name}: {status}"))
+        print(", ".join(f"{status}: {count}" for status, count in summary.items()))
+    elif args.diff:
+        report = reimport_excel_to_db(args.path)
+        for day, name, shift in (report or {}).get("added", ()):
+            print(f"+ {day:02d} {name}: {shift}")
+        for day, name, previous, shift in (report or {}).get("changed", ()):
+            print(f"~ {day:02d} {name}: {previous} -> {shift}")
+        for day, name, previous in (report or {}).get("removed", ()):
+            print(f"- {day:02d} {name}: {previous}")
+    else:
+        import_excel_to_db(args.path)
@@ -0,0 +1,38 @@
+"""
+Отправляет записанное JSON-обновление Telegram на локальный вебхук-сервер бота.
+
+Пример:
+    python -m scripts.post_update update.json --url http://127.0.0.1:8080/webhook --secret <секрет>
+"""
+import argparse
+import urllib.error
+import urllib.request
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def post_update(url: str, payload: bytes, secret: str = None) -> int:
+    """
+    POST обновления на вебхук; возвращает HTTP-статус ответа.
+    """
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers[SECRET_HEADER] = secret
+    request = urllib.request.Request(url, data=payload, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка записанного обновления на вебхук бота.")
+    parser.add_argument("update_file", help="JSON-файл с обновлением (объект Update)")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default=None)
+    args = parser.parse_args()
+
+    with open(args.update_file, "rb") as f:
+        status = post_update(args.url, f.read(), args.secret)
+    print(f"Ответ сервера: {status}")
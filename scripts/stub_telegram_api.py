@@ -0,0 +1,138 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Путь запроса Bot API: /bot<токен>/<метод>
+API_PATH = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)")
+
+
+class StubTelegramApi:
+    """
+    Локальная заглушка Telegram Bot API для проверки рассылки и очереди отправки.
+
+    Принимает любые методы и отвечает {"ok": true}; для sendMessage соблюдает
+    лимиты Telegram: при превышении rate сообщений в секунду всего или одного
+    сообщения в chat_interval секунд в чат отвечает 429 с retry_after.
+    Принятые сообщения копятся в self.messages как (время, chat_id, текст).
+
+    Бот направляется на заглушку переменной окружения
+    TELEGRAM_API_URL=http://127.0.0.1:<порт>/bot{0}/{1}.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081, rate: float = 30.0,
+                 chat_interval: float = 1.0, retry_after: int = 1):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.retry_after = retry_after
+        self.messages = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._recent = []
+        self._last_by_chat = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    @property
+    def api_url(self) -> str:
+        return "http://%s:%s/bot{0}/{1}" % self.address
+
+    def start(self):
+        thread = threading.Thread(target=self._httpd.serve_forever, name="stub-telegram-api", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def handle(self, method: str, params: dict):
+        """
+        Обрабатывает вызов метода. Возвращает (HTTP-статус, JSON-ответ).
+        """
+        if method != "sendMessage":
+            return 200, {"ok": True, "result": True}
+
+        chat_id = int(params.get("chat_id"))
+        now = time.monotonic()
+        with self._lock:
+            self._recent = [sent_at for sent_at in self._recent if now - sent_at < 1.0]
+            last = self._last_by_chat.get(chat_id)
+            if len(self._recent) >= self.rate or (last is not None and now - last < self.chat_interval):
+                self.rejected += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            self._recent.append(now)
+            self._last_by_chat[chat_id] = now
+            self.messages.append((now, chat_id, params.get("text")))
+            message_id = len(self.messages)
+
+        return 200, {"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text"),
+        }}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._dispatch({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8")
+                if (self.headers.get("Content-Type") or "").startswith("application/json"):
+                    params = json.loads(body or "{}")
+                else:
+                    params = {key: values[0] for key, values in parse_qs(body).items()}
+                self._dispatch(params)
+
+            def _dispatch(self, params):
+                path, _, query = self.path.partition("?")
+                params = dict({key: values[0] for key, values in parse_qs(query).items()}, **params)
+                match = API_PATH.match(path)
+                if match is None:
+                    status, payload = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+                else:
+                    status, payload = server.handle(match.group("method"), params)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка Telegram Bot API с лимитами отправки.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=30.0, help="сообщений в секунду всего")
+    parser.add_argument("--chat-interval", type=float, default=1.0, help="секунд между сообщениями в один чат")
+    args = parser.parse_args()
+
+    stub = StubTelegramApi(args.host, args.port, args.rate, args.chat_interval)
+    print(f"Заглушка Bot API: TELEGRAM_API_URL={stub.api_url}")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Принято сообщений: {len(stub.messages)}, отклонено (429): {stub.rejected}")